@@ -0,0 +1,207 @@
+# /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/bouquets.py
+
+import os
+import re
+import json
+import hashlib
+from . import constants, utils
+from .net import CachedResource
+
+BOUQUET_FILE_RE = re.compile(r"^userbouquet\.[^/]+\.tv$")
+
+# --- Katalog bukietów z manifestu repozytorium ---
+
+def _parse_manifest(response):
+    """
+    Manifest repozytorium bukietów (manifest.json w katalogu głównym), np.:
+    {"files": [{"name": "userbouquet.x.tv", "size": 1234, "sha256": "...", "mtime": 1700000000}]}
+    Dopuszczalna jest też sama lista wpisów. Zwraca słownik nazwa -> wpis.
+    """
+    data = json.loads(response.read().decode("utf-8"))
+    entries = data.get("files", []) if isinstance(data, dict) else data
+    catalog = {}
+    for entry in entries:
+        name = entry.get("name", "") if isinstance(entry, dict) else ""
+        if BOUQUET_FILE_RE.match(name):
+            catalog[name] = {"size": entry.get("size"), "sha256": (entry.get("sha256") or "").lower(), "mtime": entry.get("mtime")}
+    return catalog
+
+def _cache_path(manifest_url):
+    return os.path.join(constants.CACHE_DIR, "bouquets_" + hashlib.sha1(manifest_url.encode("utf-8")).hexdigest()[:12] + ".json")
+
+def load_bouquet_manifest(manifest_url, timeout=10):
+    """Katalog bukietów z manifestu, zapamiętany na dysku i odświeżany zapytaniem warunkowym."""
+    return CachedResource(manifest_url, _cache_path(manifest_url), _parse_manifest, timeout=timeout).get()
+
+def is_up_to_date(path, manifest_entry):
+    """True, gdy lokalny plik ma dokładnie tę zawartość, którą opisuje manifest."""
+    if not manifest_entry or not manifest_entry.get("sha256") or not os.path.isfile(path):
+        return False
+    if manifest_entry.get("size") is not None and os.path.getsize(path) != manifest_entry["size"]:
+        return False
+    return utils.file_hash(path, "sha256") == manifest_entry["sha256"]
+
+# --- Model pliku userbouquet ---
+
+MARKER_TYPE = "64"
+
+def service_key(ref):
+    """
+    Klucz usługi do porównań: typ/parametry i (dla IPTV) adres strumienia, bez nazwy wyświetlanej
+    doklejanej na końcu referencji. Wielkość liter w adresie bywa różna (http%3a vs http%3A).
+    """
+    fields = ref.strip().split(":")
+    return ":".join(fields[:11]).lower()
+
+class BouquetEntry(object):
+    __slots__ = ("ref", "description")
+
+    def __init__(self, ref, description=None):
+        self.ref = ref
+        self.description = description
+
+    @property
+    def is_marker(self):
+        fields = self.ref.split(":")
+        return len(fields) > 1 and fields[1] == MARKER_TYPE
+
+    def __eq__(self, other):
+        return isinstance(other, BouquetEntry) and (self.ref, self.description) == (other.ref, other.description)
+
+    def __ne__(self, other):
+        return not self == other
+
+class Bouquet(object):
+    """Plik userbouquet.*.tv: nazwa (#NAME) i lista wpisów #SERVICE z opcjonalnym #DESCRIPTION."""
+    def __init__(self, name="", entries=None):
+        self.name = name
+        self.entries = entries or []
+
+    @classmethod
+    def parse(cls, text):
+        bouquet = cls()
+        for raw_line in text.splitlines():
+            line = raw_line.strip()
+            if line.startswith("#NAME "):
+                bouquet.name = line[6:].strip()
+            elif line.startswith("#SERVICE "):
+                bouquet.entries.append(BouquetEntry(line[9:].strip()))
+            elif line.startswith("#DESCRIPTION ") and bouquet.entries:
+                # Opis dotyczy zawsze poprzedniego #SERVICE (np. nazwa znacznika lub kanału IPTV)
+                bouquet.entries[-1].description = line[13:].strip()
+        return bouquet
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return cls.parse(f.read())
+
+    def serialize(self):
+        lines = [f"#NAME {self.name}"]
+        for entry in self.entries:
+            lines.append(f"#SERVICE {entry.ref}")
+            if entry.description is not None:
+                lines.append(f"#DESCRIPTION {entry.description}")
+        return "\n".join(lines) + "\n"
+
+    def services(self):
+        return [entry for entry in self.entries if not entry.is_marker]
+
+    def __eq__(self, other):
+        return isinstance(other, Bouquet) and self.name == other.name and self.entries == other.entries
+
+    def __ne__(self, other):
+        return not self == other
+
+class BouquetDiff(object):
+    """Różnica między zainstalowaną a nową wersją bukietu (na poziomie usług, bez znaczników)."""
+    def __init__(self, old, new):
+        old_keys = set(service_key(e.ref) for e in old.services()) if old else set()
+        new_keys = set(service_key(e.ref) for e in new.services())
+        self.added = len(new_keys - old_keys)
+        self.removed = len(old_keys - new_keys)
+        self.changed = old != new
+
+    def summary(self):
+        return f"+{self.added} / -{self.removed}"
+
+def diff_installed(installed_path, new_bouquet):
+    old = None
+    if os.path.isfile(installed_path):
+        try:
+            old = Bouquet.load(installed_path)
+        except OSError:
+            pass
+    return BouquetDiff(old, new_bouquet)
+
+# --- bouquets.tv i duplikaty między bukietami ---
+
+BOUQUET_REF_RE = re.compile(r'FROM BOUQUET "([^"]+)"')
+
+def bouquet_line(filename):
+    return f'1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "{filename}" ORDER BY bouquet'
+
+def registered_bouquets(bouquets_tv_path):
+    """Pliki bukietów wskazane w bouquets.tv, w kolejności z pliku."""
+    try:
+        with open(bouquets_tv_path, "r", encoding="utf-8", errors="replace") as f:
+            return BOUQUET_REF_RE.findall(f.read())
+    except OSError:
+        return []
+
+def find_duplicates(bouquet_map):
+    """
+    Usługi obecne w więcej niż jednym bukiecie. bouquet_map: nazwa pliku -> Bouquet.
+    Zwraca słownik klucz usługi -> (opis, [pliki bukietów]).
+    """
+    seen = {}
+    for filename, bouquet in bouquet_map.items():
+        for entry in bouquet.services():
+            label, files = seen.setdefault(service_key(entry.ref), (entry.description or entry.ref.rsplit(":", 1)[-1], []))
+            if filename not in files: files.append(filename)
+    return dict((key, value) for key, value in seen.items() if len(value[1]) > 1)
+
+def load_installed(settings_dir, overrides=None):
+    """Wszystkie bukiety z bouquets.tv; overrides podmienia wybrane pliki (np. świeżo pobrane wersje)."""
+    overrides = overrides or {}
+    result = {}
+    for filename in registered_bouquets(os.path.join(settings_dir, "bouquets.tv")):
+        if filename in overrides:
+            result[filename] = overrides[filename]
+            continue
+        try:
+            result[filename] = Bouquet.load(os.path.join(settings_dir, filename))
+        except OSError:
+            pass
+    for filename, bouquet in overrides.items():
+        result.setdefault(filename, bouquet)
+    return result
+
+def write_bouquet(path, bouquet):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(bouquet.serialize())
+    os.replace(tmp_path, path)
+
+def write_bouquets_tv(bouquets_tv_path, filenames, output_path=None):
+    """
+    Zapisuje bouquets.tv uzupełniony o brakujące bukiety (domyślnie w miejscu, output_path np. do katalogu tymczasowego).
+    Zwraca True, gdy coś dopisano; w przeciwnym razie nic nie jest zapisywane.
+    """
+    registered = set(registered_bouquets(bouquets_tv_path))
+    missing = [bouquet_line(filename) for filename in filenames if filename not in registered]
+    if not missing: return False
+    lines = []
+    if os.path.exists(bouquets_tv_path):
+        with open(bouquets_tv_path, "r", encoding="utf-8", errors="replace") as f:
+            lines = [line.strip() for line in f if line.strip()]
+    output_path = output_path or bouquets_tv_path
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines + missing) + "\n")
+    os.replace(tmp_path, output_path)
+    return True
+
+def register_bouquet(bouquets_tv_path, filename):
+    """Dopisuje bukiet do bouquets.tv, jeśli go tam brakuje. Zwraca True, gdy plik został zmieniony."""
+    return write_bouquets_tv(bouquets_tv_path, [filename])
@@ -1,6 +1,6 @@
 # /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/config.py
 
-from Components.config import config, ConfigSubsection, ConfigText, configfile
+from Components.config import config, ConfigSubsection, ConfigText, ConfigInteger, ConfigYesNo, configfile
 from . import constants
 
 # Inicjalizacja sekcji konfiguracyjnej dla pluginu
@@ -8,6 +8,27 @@ config.plugins.AzmanPanel = ConfigSubsection()
 
 # Definicja opcji - przechowuje ostatnio wybraną ścieżkę do picon
 config.plugins.AzmanPanel.picon_path = ConfigText(default=constants.DEFAULT_PICON_TARGET_DIR)
+# Liczba równoległych pobrań paczek picon
+config.plugins.AzmanPanel.picon_concurrency = ConfigInteger(default=constants.PICON_DOWNLOAD_CONCURRENCY, limits=(1, 8))
+# Usuwanie picon, które zniknęły z ponownie instalowanej paczki
+config.plugins.AzmanPanel.picon_delete_stale = ConfigYesNo(default=False)
+# Instalacja tylko picon dla kanałów z lamedb/userbouquetów, opcjonalnie przez HTTP Range bez pobierania całego ZIP
+config.plugins.AzmanPanel.picon_only_owned = ConfigYesNo(default=False)
+config.plugins.AzmanPanel.picon_remote_ranges = ConfigYesNo(default=True)
+
+# Lokalny cache pakietów .ipk (ponowna instalacja / przywracanie wersji bez sieci)
+config.plugins.AzmanPanel.ipk_cache_path = ConfigText(default=constants.IPK_CACHE_DIR)
+config.plugins.AzmanPanel.ipk_cache_max_mb = ConfigInteger(default=constants.IPK_CACHE_MAX_MB, limits=(0, 10000))
+
+# Limit przepustowości sieci/zapisu instalacji w tle (KB/s, 0 = bez limitu) - osobno na czas nagrywania
+config.plugins.AzmanPanel.io_limit_kbps = ConfigInteger(default=constants.IO_LIMIT_KBPS, limits=(0, 100000))
+config.plugins.AzmanPanel.io_limit_recording_kbps = ConfigInteger(default=constants.IO_LIMIT_RECORDING_KBPS, limits=(0, 100000))
+
+# Pełny zapis wyjścia poleceń (opkg, skrypty) do pliku - konsola na ekranie trzyma tylko ostatnie linie
+config.plugins.AzmanPanel.console_log_to_file = ConfigYesNo(default=False)
+
+# Rezydentna usługa YT (yt_dlp załadowany na stałe) uruchamiana przy starcie GUI
+config.plugins.AzmanPanel.yt_resolver_autostart = ConfigYesNo(default=False)
 
 def save_config():
     """Funkcja pomocnicza do zapisu konfiguracji"""
@@ -2,14 +2,36 @@ from Components.config import config, ConfigSubsection, ConfigText, configfile
 
 PLUGIN_VERSION = "1.5.7"
 
+# --- Ustawienia enigma2 (lamedb, bukiety) ---
+ENIGMA2_SETTINGS_DIR = "/etc/enigma2"
+
+# --- Cache (indeksy feedów, manifesty) ---
+CACHE_DIR = "/var/cache/azmanpanel"
+
 # --- Azman OPKG Feed ---
 FEED_CONF_URL = "https://raw.githubusercontent.com/azman26/azman-enigma2-repo/main/azman-feed.conf"
 FEED_CONF_TARGET_PATH = "/etc/opkg/azman-feed.conf"
 FEED_PACKAGES_BASE_URL = "https://azman26.github.io/azman-enigma2-repo"
+OPKG_STATUS_FILE = "/var/lib/opkg/status"
+OPKG_INFO_DIR = "/var/lib/opkg/info"
+IPK_CACHE_DIR = "/media/hdd/azman-ipk-cache"
+IPK_CACHE_MAX_MB = 200
+
+# --- Instalacje w tle (limity I/O, 0 = bez limitu) ---
+IO_LIMIT_KBPS = 0
+IO_LIMIT_RECORDING_KBPS = 1024
+BACKGROUND_NICE = 10
+WORKER_POOL_SIZE = 4
+
+# --- Konsola poleceń (opkg, skrypty) ---
+CONSOLE_MAX_LINES = 400
+CONSOLE_REDRAW_MS = 250
+CONSOLE_LOG_PATH = "/tmp/azman_console.log"
 
 # --- Picons ---
 PICONS_BASE_URL = "https://www.topolowa4.pl/ENIGMA2/PICONY/"
 DEFAULT_PICON_TARGET_DIR = "/media/hdd/picon"
+PICON_DOWNLOAD_CONCURRENCY = 3
 PICON_RECOMMENDED_DIRS = [
     ("/media/hdd/picon", "Dysk twardy HDD (/media/hdd/picon)"),
     ("/media/usb/picon", "Pamięć USB (/media/usb/picon)")
@@ -23,13 +45,26 @@ SOURCES_XML_FILENAME = "polandAzman.sources.xml"
 # --- ArchivCZSK ---
 ARCHIVCZSK_INSTALL_CMD = "curl -s --insecure https://raw.githubusercontent.com/archivczsk/archivczsk/main/build/archivczsk_installer.sh | sh"
 
+# --- Bukiety (wspólne) ---
+BOUQUET_DOWNLOAD_CONCURRENCY = 4
+BOUQUET_STAGING_DIR_NAME = ".azman_staging"
+
+# --- Test strumieni IPTV ---
+PROBE_CONCURRENCY = 24
+PROBE_PER_HOST = 4
+PROBE_TIMEOUT = 6
+PROBE_REPORT_PATH = "/tmp/azman_stream_report.txt"
+DEAD_CHANNELS_BOUQUET = "userbouquet.azman-dead-channels.tv"
+
 # --- Bukiety IPTV PL ---
 IPTV_SETTINGS_LIST_URL = "https://github.com/azman26/azmanIPTVsettings"
 IPTV_SETTINGS_BASE_URL = "https://raw.githubusercontent.com/azman26/azmanIPTVsettings/main/"
+IPTV_SETTINGS_MANIFEST_URL = IPTV_SETTINGS_BASE_URL + "manifest.json"
 
 # --- Bukiety FAST ---
 FAST_SETTINGS_LIST_URL = "https://github.com/azman26/azmanFASTsettings"
 FAST_SETTINGS_BASE_URL = "https://raw.githubusercontent.com/azman26/azmanFASTsettings/main/"
+FAST_SETTINGS_MANIFEST_URL = FAST_SETTINGS_BASE_URL + "manifest.json"
 
 # --- Shelly Control Center ---
 SHELLY_INSTALL_CMD = 'wget -q "--no-check-certificate" https://raw.githubusercontent.com/Northmount/shelly-enigma2/main/installer.sh -O - | /bin/sh'
@@ -0,0 +1,383 @@
+# /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/feed.py
+
+import os
+import zlib
+import time
+import threading
+import urllib.request
+from . import constants, utils
+from .config import config
+from .net import CachedResource
+
+FEED_INDEX_PATH = os.path.join(constants.CACHE_DIR, "feed_index_v2.json")
+
+STATUS_INSTALLED = "Zainstalowany"
+STATUS_AVAILABLE = "Dostępny"
+STATUS_UPGRADABLE = "Dostępna aktualizacja"
+
+class PackageRecord(object):
+    """Zwarty rekord pakietu - tylko pola używane przez interfejs."""
+    __slots__ = ("name", "version", "description", "size", "depends", "filename", "checksum")
+    FIELDS = {"Package": "name", "Version": "version", "Description": "description", "Size": "size", "Depends": "depends",
+              "Filename": "filename", "SHA256sum": "checksum", "MD5Sum": "checksum"}
+
+    def __init__(self, name="", version="", description="", size="", depends="", filename="", checksum=""):
+        self.name = name
+        self.version = version
+        self.description = description
+        self.size = size
+        self.depends = depends
+        self.filename = filename
+        self.checksum = checksum
+
+    def to_row(self):
+        return [self.name, self.version, self.description, self.size, self.depends, self.filename, self.checksum]
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row)
+
+def iter_packages(stream, gzipped=True):
+    """
+    Parsuje plik Packages(.gz) strumieniowo - dekompresja i parsowanie po kawałku,
+    bez trzymania całego pliku w pamięci. Zwraca kolejne obiekty PackageRecord.
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16) if gzipped else None
+    record = PackageRecord()
+    pending = b""
+    while True:
+        chunk = stream.read(utils.READ_CHUNK_SIZE)
+        if chunk:
+            data = decompressor.decompress(chunk) if decompressor else chunk
+        else:
+            data = decompressor.flush() if decompressor else b""
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop() if chunk else b""
+        for raw_line in lines:
+            if not raw_line.strip():
+                if record.name: yield record
+                record = PackageRecord()
+                continue
+            if raw_line[:1] in (b" ", b"\t"):
+                continue  # kontynuacja wieloliniowego opisu - interfejs pokazuje tylko pierwszą linię
+            key, sep, value = raw_line.partition(b": ")
+            attr = PackageRecord.FIELDS.get(key.decode("ascii", "ignore")) if sep else None
+            if attr == "checksum" and len(record.checksum) == 64:
+                continue  # SHA256 ma pierwszeństwo przed MD5
+            if attr:
+                setattr(record, attr, value.decode("utf-8", "replace").strip())
+        if not chunk:
+            break
+    if record.name: yield record
+
+def _build_index(response):
+    return [record.to_row() for record in iter_packages(response)]
+
+def load_feed_index(timeout=20):
+    """Zwraca listę PackageRecord; przy braku zmian na feedzie czyta indeks z dysku."""
+    packages_gz_url = f"{constants.FEED_PACKAGES_BASE_URL}/all/Packages.gz"
+    rows = CachedResource(packages_gz_url, FEED_INDEX_PATH, _build_index, timeout=timeout).get()
+    return [PackageRecord.from_row(row) for row in rows]
+
+def _parse_control_stanza(lines):
+    fields = {}
+    for line in lines:
+        if line[:1] in (" ", "\t"): continue
+        key, sep, value = line.partition(": ")
+        if sep and key in ("Package", "Version", "Status"):
+            fields[key] = value.strip()
+    return fields
+
+class InstalledPackagesDB(object):
+    """
+    Stan zainstalowanych pakietów czytany bezpośrednio z bazy opkg zamiast `opkg list-installed`.
+    Plik status jest przeładowywany tylko po zmianie mtime/rozmiaru, a pliki info/*.control
+    (gdy brak pliku status) są czytane przyrostowo - tylko te, które się zmieniły.
+    """
+    def __init__(self, status_path, info_dir):
+        self.status_path = status_path
+        self.info_dir = info_dir
+        self._lock = threading.Lock()
+        self._status_stamp = None
+        self._status_packages = {}
+        self._control_cache = {}
+
+    def _read_status(self):
+        st = os.stat(self.status_path)
+        stamp = (st.st_mtime, st.st_size)
+        if stamp == self._status_stamp:
+            return self._status_packages
+        installed = {}
+        stanza = []
+        with open(self.status_path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                if line.strip():
+                    stanza.append(line)
+                    continue
+                self._add_installed(installed, _parse_control_stanza(stanza))
+                stanza = []
+        self._add_installed(installed, _parse_control_stanza(stanza))
+        self._status_stamp, self._status_packages = stamp, installed
+        return installed
+
+    @staticmethod
+    def _add_installed(installed, fields):
+        status = fields.get("Status", "").split()
+        if fields.get("Package") and status[-1:] == ["installed"]:
+            installed[fields["Package"]] = fields.get("Version", "")
+
+    def _read_info_dir(self):
+        seen = set()
+        for entry in os.listdir(self.info_dir):
+            if not entry.endswith(".control"): continue
+            seen.add(entry)
+            path = os.path.join(self.info_dir, entry)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            cached = self._control_cache.get(entry)
+            if cached and cached[0] == mtime: continue
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                fields = _parse_control_stanza(f.read().split("\n"))
+            self._control_cache[entry] = (mtime, fields.get("Package") or entry[:-len(".control")], fields.get("Version", ""))
+        for entry in set(self._control_cache) - seen:
+            del self._control_cache[entry]
+        return {name: version for mtime, name, version in self._control_cache.values()}
+
+    def get(self):
+        """Zwraca słownik nazwa -> wersja albo None, gdy baza opkg jest niedostępna."""
+        with self._lock:
+            if os.path.isfile(self.status_path):
+                return dict(self._read_status())
+            if os.path.isdir(self.info_dir):
+                return self._read_info_dir()
+        return None
+
+_installed_db = InstalledPackagesDB(constants.OPKG_STATUS_FILE, constants.OPKG_INFO_DIR)
+
+def get_installed_packages():
+    return _installed_db.get()
+
+class OpkgTransaction(object):
+    """Kolejka oczekujących operacji opkg - wszystkie instalacje i usunięcia wykonywane są zbiorczo."""
+    INSTALL = "install"
+    REMOVE = "remove"
+
+    def __init__(self):
+        self.actions = {}
+
+    def __len__(self):
+        return len(self.actions)
+
+    def get(self, name):
+        return self.actions.get(name)
+
+    def set(self, name, action):
+        self.actions[name] = action
+
+    def toggle(self, name, action):
+        if self.actions.get(name) == action:
+            del self.actions[name]
+        else:
+            self.actions[name] = action
+
+    def clear(self):
+        self.actions.clear()
+
+    def names(self, action):
+        return sorted(name for name, a in self.actions.items() if a == action)
+
+    def build_command(self, local_files=None):
+        """
+        opkg nie łączy install i remove w jednym wywołaniu, więc budujemy co najwyżej dwa:
+        najpierw jedno zbiorcze usunięcie, potem jedna zbiorcza instalacja (wspólne rozwiązywanie zależności).
+        local_files mapuje nazwę pakietu na plik .ipk z lokalnego cache.
+        """
+        commands = []
+        local_files = local_files or {}
+        removals = self.names(self.REMOVE)
+        installs = [local_files.get(name, name) for name in self.names(self.INSTALL)]
+        if removals: commands.append("opkg remove " + " ".join(removals))
+        if installs: commands.append("opkg install " + " ".join(installs))
+        return " ; ".join(commands)
+
+# --- Lokalny cache plików .ipk ---
+
+def package_url(filename):
+    return f"{constants.FEED_PACKAGES_BASE_URL}/all/{filename}"
+
+class IpkCache(object):
+    """
+    Cache plików .ipk ograniczony rozmiarem (LRU), kluczowany nazwą, wersją i sumą kontrolną z pliku Packages.
+    Pozwala na ponowną instalację i powrót do wcześniejszej wersji bez pobierania z sieci.
+    """
+    INDEX_NAME = "index.json"
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, self.INDEX_NAME)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, version, checksum):
+        return f"{name}|{version}|{checksum}"
+
+    def _load(self):
+        index = utils.load_json(self.index_path, {})
+        # Usuwamy wpisy, których pliki zniknęły z dysku
+        return {key: entry for key, entry in index.items() if os.path.isfile(os.path.join(self.cache_dir, entry["file"]))}
+
+    def _save(self, index):
+        utils.save_json_atomic(self.index_path, index)
+
+    def lookup(self, name, version, checksum):
+        with self._lock:
+            index = self._load()
+            entry = index.get(self._key(name, version, checksum))
+            if not entry: return None
+            entry["last_used"] = time.time()
+            self._save(index)
+            return os.path.join(self.cache_dir, entry["file"])
+
+    def fetch(self, name, version, checksum, filename, is_cancelled=None, throttle=None):
+        """Zwraca ścieżkę do lokalnej kopii pakietu, pobierając go do cache tylko gdy go tam nie ma."""
+        path = self.lookup(name, version, checksum)
+        if path: return path
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Pakiet wydany ponownie pod tą samą nazwą pliku ma inną sumę - każda wersja zawartości ma własny plik
+        local_name = f"{checksum.lower()[:16]}_{os.path.basename(filename)}" if checksum else os.path.basename(filename)
+        target_path = os.path.join(self.cache_dir, local_name)
+        tmp_path = target_path + ".part"
+        with urllib.request.urlopen(package_url(filename), timeout=30) as response, open(tmp_path, "wb") as f:
+            for block in iter(lambda: response.read(utils.READ_CHUNK_SIZE), b""):
+                if is_cancelled and is_cancelled():
+                    raise InterruptedError("Download cancelled by user")
+                if throttle: throttle(len(block))
+                f.write(block)
+        if checksum and utils.file_hash(tmp_path, "sha256" if len(checksum) == 64 else "md5") != checksum.lower():
+            os.remove(tmp_path)
+            raise ValueError(f"Niezgodna suma kontrolna pakietu {name} {version}")
+        os.replace(tmp_path, target_path)
+        with self._lock:
+            index = self._load()
+            key = self._key(name, version, checksum)
+            index[key] = {"name": name, "version": version, "file": local_name, "size": os.path.getsize(target_path), "last_used": time.time()}
+            self._prune(index, self.max_bytes, keep=key)
+            self._save(index)
+        return target_path
+
+    def versions(self, name):
+        """Lista (wersja, ścieżka) kopii danego pakietu w cache, od najnowszej."""
+        with self._lock:
+            entries = [e for e in self._load().values() if e["name"] == name]
+        entries.sort(key=lambda e: KeyVersion(e["version"]), reverse=True)
+        return [(e["version"], os.path.join(self.cache_dir, e["file"])) for e in entries]
+
+    def stats(self):
+        with self._lock:
+            index = self._load()
+        return len(index), sum(e["size"] for e in index.values())
+
+    def _prune(self, index, max_bytes, keep=None):
+        removed = 0
+        total = sum(e["size"] for e in index.values())
+        for key, entry in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+            if total <= max_bytes: break
+            if key == keep: continue
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError as e:
+                utils.log_error(e, "IpkCache prune")
+            total -= entry["size"]
+            del index[key]
+            removed += 1
+        return removed
+
+    def prune(self, max_bytes=None):
+        with self._lock:
+            index = self._load()
+            removed = self._prune(index, self.max_bytes if max_bytes is None else max_bytes)
+            self._save(index)
+        return removed
+
+def mount_point(path):
+    path = os.path.realpath(path)
+    while not os.path.ismount(path):
+        path = os.path.dirname(path)
+    return path
+
+def get_ipk_cache():
+    """
+    Cache na osobnym nośniku (HDD/USB) albo None. Pusty katalog /media/hdd bez zamontowanego dysku leży
+    na flashu - druga kopia każdego pakietu mogłaby zapełnić rootfs, więc cache jest wtedy wyłączony.
+    """
+    cache_dir = config.plugins.AzmanPanel.ipk_cache_path.value
+    max_bytes = config.plugins.AzmanPanel.ipk_cache_max_mb.value * 1024 * 1024
+    if not max_bytes or mount_point(cache_dir) == "/": return None
+    return IpkCache(cache_dir, max_bytes)
+
+# --- Porównywanie wersji (algorytm dpkg/opkg: epoka, wersja, rewizja, znak ~) ---
+
+def _char_order(c):
+    if c.isdigit(): return 0
+    if c.isascii() and c.isalpha(): return ord(c)
+    if c == "~": return -1
+    return ord(c) + 256
+
+def _compare_fragment(a, b):
+    ia = ib = 0
+    while ia < len(a) or ib < len(b):
+        # Część nienumeryczna - znak po znaku, '~' sortuje się przed wszystkim, nawet przed końcem napisu
+        while (ia < len(a) and not a[ia].isdigit()) or (ib < len(b) and not b[ib].isdigit()):
+            ac = _char_order(a[ia]) if ia < len(a) else 0
+            bc = _char_order(b[ib]) if ib < len(b) else 0
+            if ac != bc: return -1 if ac < bc else 1
+            ia += 1
+            ib += 1
+        # Część numeryczna - porównanie liczbowe z pominięciem zer wiodących
+        na_start = ia
+        while ia < len(a) and a[ia].isdigit(): ia += 1
+        nb_start = ib
+        while ib < len(b) and b[ib].isdigit(): ib += 1
+        na, nb = int(a[na_start:ia] or 0), int(b[nb_start:ib] or 0)
+        if na != nb: return -1 if na < nb else 1
+    return 0
+
+def _split_version(version):
+    epoch, sep, rest = version.partition(":")
+    if not sep:
+        epoch, rest = "0", version
+    upstream, sep, revision = rest.rpartition("-")
+    if not sep:
+        upstream, revision = rest, ""
+    try:
+        epoch = int(epoch)
+    except ValueError:
+        epoch = 0
+    return epoch, upstream, revision
+
+def compare_versions(a, b):
+    """Zwraca -1, 0 lub 1 - tak jak `opkg compare-versions` / `dpkg --compare-versions`."""
+    epoch_a, upstream_a, revision_a = _split_version(a.strip())
+    epoch_b, upstream_b, revision_b = _split_version(b.strip())
+    if epoch_a != epoch_b: return -1 if epoch_a < epoch_b else 1
+    return _compare_fragment(upstream_a, upstream_b) or _compare_fragment(revision_a, revision_b)
+
+class KeyVersion(object):
+    """Klucz sortowania według kolejności wersji opkg."""
+    __slots__ = ("version",)
+
+    def __init__(self, version):
+        self.version = version
+
+    def __lt__(self, other):
+        return compare_versions(self.version, other.version) < 0
+
+def package_status(feed_version, installed_version):
+    if installed_version is None: return STATUS_AVAILABLE
+    if feed_version and installed_version and compare_versions(installed_version, feed_version) < 0:
+        return STATUS_UPGRADABLE
+    return STATUS_INSTALLED
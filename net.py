@@ -0,0 +1,283 @@
+# /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/net.py
+
+import os
+import io
+import http.client
+import threading
+import urllib.request
+import urllib.error
+import urllib.parse
+from . import utils
+
+def conditional_urlopen(url, validators=None, timeout=20):
+    """
+    Wysyła warunkowe żądanie GET (If-None-Match / If-Modified-Since).
+    Zwraca (response, nowe_walidatory) albo (None, stare_walidatory) gdy serwer odpowie 304.
+    """
+    validators = validators or {}
+    request = urllib.request.Request(url)
+    if validators.get("etag"):
+        request.add_header("If-None-Match", validators["etag"])
+    if validators.get("last_modified"):
+        request.add_header("If-Modified-Since", validators["last_modified"])
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return None, validators
+        raise
+    new_validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+    return response, new_validators
+
+class CachedResource(object):
+    """
+    Zasób HTTP z trwałą kopią na dysku. Na dysku trzymamy już przetworzone dane (parse_func),
+    więc przy odpowiedzi 304 nie trzeba niczego ponownie pobierać ani parsować.
+    """
+    def __init__(self, url, cache_path, parse_func, timeout=20):
+        self.url = url
+        self.cache_path = cache_path
+        self.parse_func = parse_func
+        self.timeout = timeout
+        self.from_cache = False
+
+    def _load_cached(self):
+        cached = utils.load_json(self.cache_path)
+        if not isinstance(cached, dict) or cached.get("url") != self.url or "data" not in cached:
+            return None
+        return cached
+
+    def get(self):
+        cached = self._load_cached()
+        validators = cached.get("validators") if cached else None
+        try:
+            response, new_validators = conditional_urlopen(self.url, validators, self.timeout)
+        except Exception as e:
+            # Brak sieci - jeśli mamy kopię, lepiej pokazać ją niż błąd
+            if cached is None:
+                raise
+            utils.log_error(e, f"CachedResource (offline): {self.url}")
+            self.from_cache = True
+            return cached["data"]
+        if response is None:
+            self.from_cache = True
+            return cached["data"]
+        with response:
+            data = self.parse_func(response)
+        try:
+            utils.save_json_atomic(self.cache_path, {"url": self.url, "validators": new_validators, "data": data})
+        except OSError as e:
+            utils.log_error(e, f"CachedResource save: {self.cache_path}")
+        self.from_cache = False
+        return data
+
+def download_resumable(url, dest_path, is_cancelled=None, timeout=30, chunk_size=utils.READ_CHUNK_SIZE, throttle=None):
+    """
+    Pobiera plik do dest_path z możliwością wznowienia. Częściowe dane trzymane są w dest_path.part,
+    a walidatory (ETag/Last-Modified) w dest_path.meta - kolejna próba wysyła Range + If-Range
+    i dopisuje tylko brakującą część, o ile plik na serwerze się nie zmienił.
+    """
+    part_path = dest_path + ".part"
+    meta_path = dest_path + ".meta"
+    meta = utils.load_json(meta_path, {})
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) and meta.get("url") == url else 0
+    validator = meta.get("etag") or meta.get("last_modified")
+    request = urllib.request.Request(url)
+    if offset and validator:
+        request.add_header("Range", f"bytes={offset}-")
+        request.add_header("If-Range", validator)
+    else:
+        offset = 0
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and offset and offset == meta.get("total"):
+            os.replace(part_path, dest_path)  # część była już kompletna
+            os.remove(meta_path)
+            return dest_path
+        raise
+    with response:
+        if response.status == 206 and response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+            mode = "ab"
+        else:
+            offset, mode = 0, "wb"  # plik na serwerze zmienił się albo serwer nie obsługuje Range
+        length = response.headers.get("Content-Length")
+        total = offset + int(length) if length else None
+        utils.save_json_atomic(meta_path, {"url": url, "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified"), "total": total})
+        with open(part_path, mode) as f:
+            for block in iter(lambda: response.read(chunk_size), b""):
+                if is_cancelled and is_cancelled():
+                    raise InterruptedError("Download cancelled")
+                if throttle: throttle(len(block))
+                f.write(block)
+    if total is not None and os.path.getsize(part_path) != total:
+        raise IOError(f"Niekompletne pobieranie: {url}")
+    os.replace(part_path, dest_path)
+    os.remove(meta_path)
+    return dest_path
+
+class HttpConnectionPool(object):
+    """
+    Trwałe połączenia HTTP(S) keep-alive - po jednym na wątek i host. Kolejne pliki z tego samego
+    serwera (np. raw.githubusercontent.com) nie wymagają nowego uzgadniania TLS.
+    """
+    MAX_REDIRECTS = 3
+
+    def __init__(self, timeout=20, chunk_size=utils.READ_CHUNK_SIZE):
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _connection(self, scheme, netloc, fresh=False):
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        key = (scheme, netloc)
+        conn = connections.get(key)
+        if conn is None or fresh:
+            if conn: conn.close()
+            connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = connections[key] = connection_class(netloc, timeout=self.timeout)
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def _get_once(self, url, is_cancelled, throttle):
+        parsed = urllib.parse.urlsplit(url)
+        path = (parsed.path or "/") + ("?" + parsed.query if parsed.query else "")
+        for attempt in (0, 1):
+            conn = self._connection(parsed.scheme, parsed.netloc, fresh=bool(attempt))
+            try:
+                conn.request("GET", path, headers={"Accept-Encoding": "identity"})
+                response = conn.getresponse()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # Serwer zamknął bezczynne połączenie - jedna próba na nowym
+                if attempt: raise
+        chunks = []
+        for block in iter(lambda: response.read(self.chunk_size), b""):
+            if is_cancelled and is_cancelled():
+                conn.close()
+                raise InterruptedError("Download cancelled")
+            if throttle: throttle(len(block))
+            chunks.append(block)
+        return response, b"".join(chunks)
+
+    def get(self, url, is_cancelled=None, throttle=None):
+        for _ in range(self.MAX_REDIRECTS + 1):
+            response, data = self._get_once(url, is_cancelled, throttle)
+            if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                url = urllib.parse.urljoin(url, response.getheader("Location"))
+                continue
+            if response.status != 200:
+                raise IOError(f"HTTP {response.status}: {url}")
+            return data
+        raise IOError(f"Zbyt wiele przekierowań: {url}")
+
+    def close(self):
+        with self._lock:
+            for conn in self._all: conn.close()
+            self._all = []
+
+class RangeNotSupported(IOError):
+    pass
+
+class HttpRangeFile(io.RawIOBase):
+    """
+    Plik tylko do odczytu, którego zawartość pobierana jest na żądanie zapytaniami HTTP Range
+    przez jedno trwałe połączenie. Pozwala np. otworzyć zdalny ZIP przez zipfile i pobrać
+    tylko katalog centralny oraz potrzebne pliki, zamiast całego archiwum.
+    """
+    MAX_REDIRECTS = 3
+
+    def __init__(self, url, timeout=20, block_size=utils.READ_CHUNK_SIZE, throttle=None):
+        super(HttpRangeFile, self).__init__()
+        self.timeout = timeout
+        self.throttle = throttle
+        self.block_size = block_size
+        self.position = 0
+        self.bytes_fetched = 0
+        self._buffer_start = 0
+        self._buffer = b""
+        self._conn = None
+        self._connect_to(url)
+        self.size = self._probe()
+
+    def _connect_to(self, url):
+        self.url = url
+        parsed = urllib.parse.urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        if self._conn: self._conn.close()
+        self._conn = connection_class(parsed.netloc, timeout=self.timeout)
+        self._path = parsed.path + ("?" + parsed.query if parsed.query else "")
+
+    def _request(self, method, headers):
+        for attempt in (0, 1):
+            try:
+                self._conn.request(method, self._path, headers=headers)
+                return self._conn.getresponse()
+            except (http.client.HTTPException, ConnectionError):
+                # Serwer zamknął połączenie keep-alive - jedna ponowna próba na nowym połączeniu
+                self._conn.close()
+                if attempt: raise
+
+    def _probe(self):
+        for _ in range(self.MAX_REDIRECTS + 1):
+            response = self._request("HEAD", {})
+            response.read()
+            if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                self._connect_to(urllib.parse.urljoin(self.url, response.getheader("Location")))
+                continue
+            if response.status != 200:
+                raise IOError(f"HTTP {response.status}: {self.url}")
+            if response.getheader("Accept-Ranges", "").lower() != "bytes" or not response.getheader("Content-Length"):
+                raise RangeNotSupported(self.url)
+            return int(response.getheader("Content-Length"))
+        raise IOError(f"Zbyt wiele przekierowań: {self.url}")
+
+    def _fetch(self, start, length):
+        end = min(start + length, self.size) - 1
+        response = self._request("GET", {"Range": f"bytes={start}-{end}"})
+        data = response.read()
+        if response.status != 206:
+            raise RangeNotSupported(self.url)
+        self.bytes_fetched += len(data)
+        if self.throttle: self.throttle(len(data))
+        return data
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET: self.position = offset
+        elif whence == io.SEEK_CUR: self.position += offset
+        elif whence == io.SEEK_END: self.position = self.size + offset
+        self.position = max(0, self.position)
+        return self.position
+
+    def readinto(self, b):
+        wanted = min(len(b), self.size - self.position)
+        if wanted <= 0: return 0
+        offset = self.position - self._buffer_start
+        if not (0 <= offset and offset + wanted <= len(self._buffer)):
+            self._buffer_start = self.position
+            self._buffer = self._fetch(self.position, max(wanted, self.block_size))
+            offset = 0
+        chunk = self._buffer[offset:offset + wanted]
+        b[:len(chunk)] = chunk
+        self.position += len(chunk)
+        return len(chunk)
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+        super(HttpRangeFile, self).close()
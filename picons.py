@@ -0,0 +1,288 @@
+# /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/picons.py
+
+import os
+import re
+import glob
+import hashlib
+import zipfile
+import unicodedata
+from . import utils
+
+MANIFEST_NAME = ".azman_picons.json"
+PARTIAL_DIR_NAME = ".azman_partial"
+def verify_zip(path):
+    """Sprawdza katalog centralny i sumy CRC wszystkich plików; uszkodzone archiwum jest usuwane."""
+    try:
+        with zipfile.ZipFile(path, "r") as zip_ref:
+            bad_member = zip_ref.testzip()
+        if bad_member is None: return
+        error = zipfile.BadZipFile(f"Uszkodzony plik w archiwum: {bad_member}")
+    except zipfile.BadZipFile as e:
+        error = e
+    os.remove(path)
+    raise error
+
+# --- Indeks kanałów odbiornika (lamedb + userbouquety) ---
+
+SNP_STRIP_SUFFIXES = ("uhd", "fhd", "hd")
+
+def snp_name(name):
+    """Nazwa picony w formacie SNP (jak w OpenPLi: znormalizowana nazwa kanału)."""
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    name = name.replace("&", "and").replace("+", "plus").replace("*", "star").lower()
+    return re.sub(r"[^a-z0-9]", "", name)
+
+def srp_name(ref_fields):
+    """Nazwa picony w formacie SRP z pierwszych 10 pól referencji serwisu, np. 1_0_19_1B1F_C3_13E_820000_0_0_0."""
+    fields = [f.upper() for f in ref_fields[:10]]
+    if len(fields) < 10: return None
+    return "_".join(fields)
+
+class ChannelIndex(object):
+    """Referencje serwisów i nazwy SNP kanałów, które faktycznie są na liście odbiornika."""
+    def __init__(self):
+        self.refs = set()
+        self.snp = set()
+
+    def __len__(self):
+        return len(self.refs) + len(self.snp)
+
+    def add_ref(self, ref_fields):
+        ref = srp_name(ref_fields)
+        if not ref: return
+        self.refs.add(ref)
+        # Strumienie IPTV (4097/5001/5002) mają picony zapisywane zwykle pod referencją z typem 1
+        if ref_fields[0] != "1":
+            self.refs.add(srp_name(["1"] + list(ref_fields[1:10])))
+
+    def add_name(self, name):
+        name = snp_name(name)
+        if not name: return
+        self.snp.add(name)
+        for suffix in SNP_STRIP_SUFFIXES:
+            if name.endswith(suffix) and len(name) > len(suffix):
+                self.snp.add(name[:-len(suffix)])
+                break
+
+    def wants(self, member_filename):
+        base, ext = os.path.splitext(os.path.basename(member_filename))
+        if ext.lower() != ".png": return False
+        return base.upper() in self.refs or base.lower() in self.snp
+
+    def _load_lamedb(self, path):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            lines = f.read().split("\n")
+        if lines and "/5/" in lines[0]:
+            # lamedb5: s:sid:ns:tsid:onid:type:number,"Nazwa",...
+            for line in lines:
+                if not line.startswith("s:"): continue
+                head, _, rest = line[2:].partition(",")
+                self._add_service(head.split(":"), rest.split(",")[0].strip('"'))
+            return
+        # lamedb4: w sekcji services każda usługa to trzy linie - nagłówek, nazwa i dostawca (p:...,c:...)
+        in_services = False
+        i = 0
+        while i < len(lines):
+            line = lines[i].strip()
+            if line == "services":
+                in_services = True
+            elif line == "end":
+                in_services = False
+            elif in_services and line.count(":") >= 4 and i + 1 < len(lines):
+                self._add_service(line.split(":"), lines[i + 1].strip())
+                i += 3
+                continue
+            i += 1
+
+    def _add_service(self, parts, name):
+        # lamedb: sid/ns/tsid/onid szesnastkowo, typ usługi dziesiętnie; w referencji typ jest szesnastkowy (25 -> 19)
+        try:
+            sid, ns, tsid, onid = (int(p, 16) for p in parts[:4])
+            stype = int(parts[4])
+        except ValueError:
+            return
+        self.add_ref(["1", "0", f"{stype:X}", f"{sid:X}", f"{tsid:X}", f"{onid:X}", f"{ns:X}", "0", "0", "0"])
+        if name: self.add_name(name)
+
+    def _load_bouquet(self, path):
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                if line.startswith("#SERVICE "):
+                    fields = line[9:].strip().split(":")
+                    if len(fields) < 10 or fields[1] == "64" or "FROM BOUQUET" in line: continue  # znaczniki i podbukiety
+                    self.add_ref(fields)
+                    if len(fields) > 11 and fields[-1]: self.add_name(fields[-1])
+                elif line.startswith("#DESCRIPTION "):
+                    self.add_name(line[13:].strip())
+
+    @classmethod
+    def build(cls, settings_dir):
+        index = cls()
+        lamedb = os.path.join(settings_dir, "lamedb5")
+        if not os.path.exists(lamedb): lamedb = os.path.join(settings_dir, "lamedb")
+        for loader, paths in ((index._load_lamedb, [lamedb]), (index._load_bouquet, glob.glob(os.path.join(settings_dir, "userbouquet.*")))):
+            for path in paths:
+                try:
+                    if os.path.isfile(path): loader(path)
+                except Exception as e:
+                    utils.log_error(e, f"ChannelIndex: {path}")
+        return index
+
+class PiconManifest(object):
+    """
+    Lista zainstalowanych picon: plik -> [crc32, rozmiar] oraz paczka ZIP -> lista jej plików.
+    Trzymana w katalogu picon, aby kolejna instalacja mogła zapisać tylko nowe lub zmienione pliki.
+    """
+    def __init__(self, target_dir):
+        self.path = os.path.join(target_dir, MANIFEST_NAME)
+        data = utils.load_json(self.path, {})
+        self.files = data.get("files", {})
+        self.packs = data.get("packs", {})
+
+    def save(self):
+        utils.save_json_atomic(self.path, {"files": self.files, "packs": self.packs})
+
+    def owners(self, filename, exclude_pack=None):
+        return [pack for pack, names in self.packs.items() if pack != exclude_pack and filename in names]
+
+class PiconSyncStats(object):
+    __slots__ = ("written_files", "written_bytes", "skipped_files", "skipped_bytes", "deleted_files", "filtered_files", "dedup_files", "dedup_bytes")
+
+    def __init__(self):
+        self.written_files = self.written_bytes = 0
+        self.skipped_files = self.skipped_bytes = 0
+        self.deleted_files = 0
+        self.filtered_files = 0
+        self.dedup_files = self.dedup_bytes = 0
+
+    def summary(self):
+        mb = 1024.0 * 1024.0
+        text = (f"Zapisano: {self.written_files} plików ({self.written_bytes / mb:.1f} MB)\n"
+                f"Pominięto niezmienione: {self.skipped_files} plików ({self.skipped_bytes / mb:.1f} MB)")
+        if self.dedup_files:
+            ratio = 100.0 * self.dedup_bytes / self.written_bytes if self.written_bytes else 0.0
+            text += f"\nDuplikaty jako dowiązania: {self.dedup_files} plików ({self.dedup_bytes / mb:.1f} MB, {ratio:.0f}% zapisu)"
+        if self.filtered_files:
+            text += f"\nPominięto kanały spoza listy: {self.filtered_files} plików"
+        if self.deleted_files:
+            text += f"\nUsunięto nieaktualne: {self.deleted_files} plików"
+        return text
+
+class PiconExtractor(object):
+    """
+    Różnicowa synchronizacja paczek picon na podstawie CRC32 i rozmiaru z katalogu centralnego ZIP.
+    Identyczne obrazki (ten sam SHA1) zapisywane są raz - kolejne nazwy stają się twardymi dowiązaniami;
+    na systemach plików bez nich (FAT) zostają pełne kopie. Nowa zawartość zawsze trafia do pliku
+    tymczasowego i jest podmieniana przez os.replace, więc nadpisanie nie zmienia innych dowiązań.
+    """
+    LINK_HARD, LINK_NONE = "hard", "none"
+
+    def __init__(self, target_dir, delete_stale=False, channel_index=None, throttle=None, write_buffer=utils.READ_CHUNK_SIZE):
+        self.target_dir = target_dir
+        self.throttle = throttle
+        self.write_buffer = write_buffer
+        self.delete_stale = delete_stale
+        self.channel_index = channel_index
+        self.manifest = PiconManifest(target_dir)
+        self.stats = PiconSyncStats()
+        self.link_mode = self.LINK_HARD
+        self.blobs = {}
+        self._blob_names = {}
+        for filename, entry in self.manifest.files.items():
+            if len(entry) > 2 and entry[2] and entry[2] not in self.blobs:
+                self._register_blob(entry[2], filename)
+
+    def _register_blob(self, digest, filename):
+        # Plik źródłowy dostał nową zawartość - stary skrót nie może już na niego wskazywać
+        previous = self._blob_names.pop(filename, None)
+        if previous and self.blobs.get(previous) == filename:
+            del self.blobs[previous]
+        self.blobs[digest] = filename
+        self._blob_names[filename] = digest
+
+    def _is_unchanged(self, member):
+        target_path = os.path.join(self.target_dir, member.filename)
+        try:
+            size = os.path.getsize(target_path)
+        except OSError:
+            return False
+        if size != member.file_size:
+            return False
+        known = self.manifest.files.get(member.filename)
+        if known is not None:
+            return known[:2] == [member.CRC, member.file_size]
+        # Plik zainstalowany przed wprowadzeniem manifestu - odczyt jest tańszy niż ponowny zapis na flash
+        return utils.file_hash(target_path, "crc32") == member.CRC
+
+    def _link(self, source_name, target_path):
+        source_path = os.path.join(self.target_dir, source_name)
+        tmp_link = target_path + ".lnk"
+        if self.link_mode == self.LINK_HARD:
+            try:
+                os.link(source_path, tmp_link)
+                os.replace(tmp_link, target_path)
+                return True
+            except OSError:
+                self.link_mode = self.LINK_NONE  # np. FAT na pendrive - zostają pełne kopie
+        return False
+
+    def _write_member(self, zip_ref, member):
+        target_path = utils.safe_zip_target_path(member, self.target_dir)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        tmp_path = target_path + ".tmp"
+        hasher = hashlib.sha1()
+        with zip_ref.open(member, "r") as source, open(tmp_path, "wb", buffering=self.write_buffer) as target:
+            for block in iter(lambda: source.read(utils.READ_CHUNK_SIZE), b""):
+                hasher.update(block)
+                if self.throttle: self.throttle(len(block))
+                target.write(block)
+        digest = hasher.hexdigest()
+        existing = self.blobs.get(digest)
+        if existing and existing != member.filename and os.path.isfile(os.path.join(self.target_dir, existing)) and self._link(existing, target_path):
+            os.remove(tmp_path)
+            self.stats.dedup_files += 1
+            self.stats.dedup_bytes += member.file_size
+        else:
+            os.replace(tmp_path, target_path)
+            self._register_blob(digest, member.filename)
+        return digest
+
+    def extract_member(self, zip_ref, member):
+        if self._is_unchanged(member):
+            self.stats.skipped_files += 1
+            self.stats.skipped_bytes += member.file_size
+            known = self.manifest.files.get(member.filename) or []
+            digest = known[2] if len(known) > 2 else None
+        else:
+            digest = self._write_member(zip_ref, member)
+            self.stats.written_files += 1
+            self.stats.written_bytes += member.file_size
+        self.manifest.files[member.filename] = [member.CRC, member.file_size, digest]
+
+    def _remove_stale(self, pack_name, current_names):
+        for filename in set(self.manifest.packs.get(pack_name, [])) - current_names:
+            if self.manifest.owners(filename, exclude_pack=pack_name): continue
+            target_path = os.path.join(self.target_dir, filename)
+            if not os.path.realpath(target_path).startswith(os.path.realpath(self.target_dir)): continue
+            try:
+                if os.path.isfile(target_path):
+                    os.remove(target_path)
+                    self.stats.deleted_files += 1
+            except OSError as e:
+                utils.log_error(e, f"PiconExtractor: {filename}")
+            self.manifest.files.pop(filename, None)
+
+    def extract_zip(self, zip_ref, pack_name, is_cancelled=None):
+        current_names = set()
+        for member in zip_ref.infolist():
+            if is_cancelled and is_cancelled(): raise InterruptedError("Installation cancelled")
+            if member.is_dir(): continue
+            if self.channel_index is not None and not self.channel_index.wants(member.filename):
+                self.stats.filtered_files += 1
+                continue
+            self.extract_member(zip_ref, member)
+            current_names.add(member.filename)
+        if self.delete_stale:
+            self._remove_stale(pack_name, current_names)
+        self.manifest.packs[pack_name] = sorted(current_names)
+        self.manifest.save()
@@ -2,10 +2,16 @@
 
 from Plugins.Plugin import PluginDescriptor
 from .screens import AzmanPanelMainScreen
+from .ui_components import start_yt_resolver
+from .config import config
 
 def main(session, **kwargs):
     session.open(AzmanPanelMainScreen)
 
+def autostart(reason, **kwargs):
+    if reason == 0 and config.plugins.AzmanPanel.yt_resolver_autostart.value:
+        start_yt_resolver()
+
 def Plugins(**kwargs):
     return [PluginDescriptor(
         name="Azman Panel", 
@@ -13,4 +19,4 @@ def Plugins(**kwargs):
         icon="icon.png",
         where=[PluginDescriptor.WHERE_PLUGINMENU], 
         fnc=main
-    )]
\ No newline at end of file
+    ), PluginDescriptor(where=[PluginDescriptor.WHERE_SESSIONSTART], fnc=autostart)]
\ No newline at end of file
@@ -0,0 +1,212 @@
+# /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/prober.py
+
+import os
+import ssl
+import time
+import asyncio
+import urllib.parse
+from . import constants, bouquets
+
+STREAM_SERVICE_TYPES = ("4097", "5001", "5002", "8193", "8739")
+HLS_HEAD_BYTES = 4096
+MAX_REDIRECTS = 3
+USER_AGENT = "Mozilla/5.0 (AzmanPanel stream check)"
+
+def stream_url(ref):
+    """Adres strumienia z referencji usługi (#SERVICE 4097:...:http%3a//...:Nazwa) albo None."""
+    fields = ref.split(":")
+    if len(fields) < 11 or fields[0] not in STREAM_SERVICE_TYPES or "%3a" not in fields[10].lower():
+        return None
+    return urllib.parse.unquote(fields[10])
+
+def collect_channels(bouquet_map):
+    """Lista (plik bukietu, nazwa kanału, wpis, url) dla wszystkich kanałów strumieniowych."""
+    channels = []
+    for filename, bouquet in bouquet_map.items():
+        if filename == constants.DEAD_CHANNELS_BOUQUET: continue
+        for entry in bouquet.services():
+            url = stream_url(entry.ref)
+            if url:
+                channels.append((filename, entry.description or entry.ref.split(":")[-1] or url, entry, url))
+    return channels
+
+class ProbeResult(object):
+    __slots__ = ("url", "ok", "status", "latency_ms")
+
+    def __init__(self, url, ok, status, latency_ms=None):
+        self.url = url
+        self.ok = ok
+        self.status = status
+        self.latency_ms = latency_ms
+
+# --- Sprawdzanie pojedynczego adresu (asyncio, bez zewnętrznych bibliotek) ---
+
+def _ssl_context():
+    # Serwery IPTV często mają nieważne certyfikaty - sprawdzamy dostępność, nie tożsamość
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+async def _read_head(reader):
+    status_line = (await reader.readline()).decode("latin-1").strip()
+    parts = status_line.split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+        raise ValueError(f"Niepoprawna odpowiedź: {status_line[:40]}")
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""): break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return int(parts[1]), headers
+
+async def _read_some(reader, limit):
+    data = b""
+    while len(data) < limit:
+        block = await reader.read(limit - len(data))
+        if not block: break
+        data += block
+    return data
+
+class StreamProber(object):
+    """
+    Równoległe sprawdzanie adresów strumieni: globalny limit połączeń, osobny limit na host
+    i krótki timeout na całe sprawdzenie. Dla HLS pobierany jest początek playlisty (#EXTM3U),
+    dla pozostałych strumieni wystarczy poprawny nagłówek odpowiedzi.
+    """
+    def __init__(self, concurrency=constants.PROBE_CONCURRENCY, per_host=constants.PROBE_PER_HOST, timeout=constants.PROBE_TIMEOUT):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+
+    def _host_limit(self, host):
+        semaphore = self._hosts.get(host)
+        if semaphore is None:
+            semaphore = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return semaphore
+
+    async def _request(self, url):
+        parts = urllib.parse.urlsplit(url)
+        secure = parts.scheme == "https"
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or (443 if secure else 80), ssl=self._ssl if secure else None)
+        try:
+            writer.write((f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUser-Agent: {USER_AGENT}\r\nAccept: */*\r\nConnection: close\r\n\r\n").encode("latin-1"))
+            await writer.drain()
+            status, headers = await _read_head(reader)
+            is_hls = parts.path.lower().endswith((".m3u8", ".m3u")) or "mpegurl" in headers.get("content-type", "").lower()
+            body = await _read_some(reader, HLS_HEAD_BYTES) if status == 200 and is_hls else b""
+            return status, headers, is_hls, body
+        finally:
+            writer.close()
+
+    async def _check(self, url):
+        current = url
+        for _ in range(MAX_REDIRECTS + 1):
+            status, headers, is_hls, body = await self._request(current)
+            if status in (301, 302, 303, 307, 308) and headers.get("location"):
+                current = urllib.parse.urljoin(current, headers["location"])
+                continue
+            if status not in (200, 206):
+                return False, f"HTTP {status}"
+            if is_hls and b"#EXTM3U" not in body[:256]:
+                return False, "Niepoprawna playlista"
+            return True, "OK"
+        return False, "Zbyt wiele przekierowań"
+
+    async def _probe(self, url):
+        # Najpierw slot hosta, potem globalny; czekanie w kolejce nie wlicza się do timeoutu ani czasu odpowiedzi.
+        # Przekierowania idą w ramach slotu hosta z adresu kanału.
+        async with self._host_limit(urllib.parse.urlsplit(url).netloc):
+            async with self._global:
+                start = time.monotonic()
+                try:
+                    ok, status = await asyncio.wait_for(self._check(url), self.timeout)
+                except asyncio.TimeoutError:
+                    ok, status = False, "Timeout"
+                except (OSError, ValueError, ssl.SSLError) as e:
+                    ok, status = False, f"Błąd połączenia ({type(e).__name__})"
+                return ProbeResult(url, ok, status, int((time.monotonic() - start) * 1000))
+
+    async def _run(self, urls, progress, is_cancelled):
+        self._global = asyncio.Semaphore(self.concurrency)
+        self._hosts = {}
+        self._ssl = _ssl_context()
+        tasks = [asyncio.ensure_future(self._probe(url)) for url in urls]
+        results = {}
+        try:
+            for done, future in enumerate(asyncio.as_completed(tasks), 1):
+                result = await future
+                results[result.url] = result
+                if progress: progress(done, len(tasks))
+                if is_cancelled and is_cancelled():
+                    raise InterruptedError("Probe cancelled")
+        finally:
+            for task in tasks: task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return results
+
+    def probe(self, urls, progress=None, is_cancelled=None):
+        """Sprawdza unikalne adresy; zwraca słownik url -> ProbeResult. Uruchamiane w wątku roboczym."""
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self._run(sorted(set(urls)), progress, is_cancelled))
+        finally:
+            loop.close()
+
+# --- Raport i bukiet martwych kanałów ---
+
+class ProbeReport(object):
+    def __init__(self, channels, results):
+        self.channels = channels
+        self.results = results
+
+    def dead_channels(self):
+        return [channel for channel in self.channels if not self.results[channel[3]].ok]
+
+    def summary(self):
+        dead = self.dead_channels()
+        latencies = sorted(r.latency_ms for r in self.results.values() if r.ok)
+        text = f"Sprawdzono kanałów: {len(self.channels)} (adresów: {len(self.results)})\nDziała: {len(self.channels) - len(dead)}, nie działa: {len(dead)}"
+        if latencies:
+            text += f"\nCzas odpowiedzi (mediana): {latencies[len(latencies) // 2]} ms"
+        return text
+
+    def lines(self):
+        """Wiersze raportu: najpierw niedziałające kanały, potem działające według czasu odpowiedzi."""
+        def sort_key(channel):
+            result = self.results[channel[3]]
+            return (result.ok, result.latency_ms or 0, channel[1].lower())
+        lines = []
+        for filename, name, _, url in sorted(self.channels, key=sort_key):
+            result = self.results[url]
+            state = "OK " if result.ok else "BRAK"
+            lines.append(f"[{state}] {name} ({filename}) - {result.status}, {result.latency_ms} ms")
+        return lines
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.summary() + "\n\n" + "\n".join(self.lines()) + "\n")
+
+    def dead_bouquet(self):
+        """Bukiet z niedziałającymi kanałami pogrupowanymi znacznikami według bukietu źródłowego."""
+        bouquet = bouquets.Bouquet("Azman - niedziałające kanały")
+        current = None
+        for marker_id, (filename, name, entry, _) in enumerate(sorted(self.dead_channels(), key=lambda c: c[0]), 1):
+            if filename != current:
+                current = filename
+                bouquet.entries.append(bouquets.BouquetEntry(f"1:64:{marker_id}:0:0:0:0:0:0:0::{filename}", filename))
+            bouquet.entries.append(bouquets.BouquetEntry(entry.ref, entry.description))
+        return bouquet
+
+def write_dead_bouquet(report, settings_dir):
+    """Zapisuje bukiet martwych kanałów i rejestruje go w bouquets.tv. Zwraca True, gdy coś się zmieniło."""
+    path = os.path.join(settings_dir, constants.DEAD_CHANNELS_BOUQUET)
+    new_bouquet = report.dead_bouquet()
+    if not new_bouquet.entries and not os.path.exists(path):
+        return False  # wszystko działa - nie tworzymy pustego bukietu
+    changed = bouquets.diff_installed(path, new_bouquet).changed
+    if changed:
+        bouquets.write_bouquet(path, new_bouquet)
+    return bouquets.register_bouquet(os.path.join(settings_dir, "bouquets.tv"), constants.DEAD_CHANNELS_BOUQUET) or changed
@@ -6,14 +6,14 @@ from Components.Pixmap import Pixmap
 from Components.Sources.StaticText import StaticText
 from Screens.Screen import Screen
 from Screens.MessageBox import MessageBox
+from Screens.ChoiceBox import ChoiceBox
 from Screens.Standby import TryQuitMainloop
 from Tools.LoadPixmap import LoadPixmap
 from skin import loadSkin
-from enigma import eTimer
 
-from . import constants, utils
-from .workers import PiconZipListWorker, PiconInstallationWorker, SourcesXmlDownloadWorker, IptvBouquetListWorker, IptvBouquetInstallWorker
-from .ui_components import AzmanFeedScreen, PiconPathSelectionScreen, DownloadProgressScreen, AzmanSelectListScreen, OpkgCommandScreen, YtRunnerScreen
+from . import constants, utils, tasks
+from .workers import PiconZipListWorker, PiconInstallationWorker, SourcesXmlDownloadWorker, IptvBouquetListWorker, IptvBouquetInstallWorker, StreamProbeWorker
+from .ui_components import AzmanFeedScreen, PiconPathSelectionScreen, DownloadProgressScreen, AzmanSelectListScreen, OpkgCommandScreen, YtRunnerScreen, StreamProbeReportScreen
 from .config import config, save_config
 
 PLUGIN_PATH = os.path.dirname(os.path.realpath(__file__))
@@ -29,6 +29,7 @@ class AzmanPanelMainScreen(Screen):
         self.markerPixmap = LoadPixmap(f"{PLUGIN_PATH}/icons/marker.png")
         self.selected_pos = (0, 0)
         self.params_for_screen_after_install = None
+        self.bouquet_manifest = {}
         self["title"] = Label("Azman Panel")
         self["version_info"] = Label(constants.PLUGIN_VERSION)
         self["description"] = Label("")
@@ -63,6 +64,7 @@ class AzmanPanelMainScreen(Screen):
             ("Archiv CZSK", self.start_archivczsk_install, "icon_archivczsk.png", "Zainstaluj plugin ArchivCZSK."),
             ("AjPanel", self.open_ajpanel, "icon_ajpanel.png", "Zainstaluj plugin AjPanel. Ta funkcja jest w budowie."),
             ("M3UIPTV", self.open_m3uiptv, "icon_m3uiptv.png", "Pobieranie i konwertowanie list m3u do bukietu E2. Ta funkcja jest w budowie. "),
+            ("Test strumieni", self.start_stream_probe, "icon_probe.png", "Sprawdza dostępność kanałów IPTV z zainstalowanych bukietów."),
         ]
         self.menu_items = [{"text": t, "func": f, "pixmap": self._load_icon(i), "desc": d} for t, f, i, d in menu_definitions]
         self.GRID_ROWS = (len(self.menu_items) + self.GRID_COLS - 1) // self.GRID_COLS
@@ -191,18 +193,13 @@ class AzmanPanelMainScreen(Screen):
         item_list = [(filename, urllib.parse.unquote(filename)) for filename in picon_zip_filenames]
         def open_select_list_screen():
             self.session.open(AzmanSelectListScreen, "Wybierz paczki picon", item_list, on_save_callback=self.on_picons_selected)
-        # Użycie eTimer tutaj jest poprawne, bo nie ma konfliktu z zamykaniem okien
-        self.open_timer = eTimer()
-        try:
-            self.open_timer_conn = self.open_timer.timeout.connect(open_select_list_screen)
-        except:
-            self.open_timer.callback.append(open_select_list_screen)
-        self.open_timer.start(1, True)
+        # Otwarcie w kolejnym obiegu pętli, nie w trakcie obsługi callbacku workera
+        tasks.dispatcher.post(open_select_list_screen)
 
     def on_picons_selected(self, selected_zips):
         if not selected_zips: return
         self.progress_screen = self.session.open(DownloadProgressScreen, title="Instalowanie picon...")
-        self.current_worker = PiconInstallationWorker(selected_zips=selected_zips, target_dir=self.picon_target_dir, callback_progress=self.progress_screen.setProgress, callback_finished=self.on_picon_installation_finished)
+        self.current_worker = PiconInstallationWorker(selected_zips=selected_zips, target_dir=self.picon_target_dir, callback_progress=self.progress_screen.setProgress, callback_finished=self.on_picon_installation_finished, concurrency=config.plugins.AzmanPanel.picon_concurrency.value, delete_stale=config.plugins.AzmanPanel.picon_delete_stale.value, only_owned=config.plugins.AzmanPanel.picon_only_owned.value, remote_ranges=config.plugins.AzmanPanel.picon_remote_ranges.value)
         self.progress_screen.parent_worker = self.current_worker
         self.current_worker.start()
         
@@ -223,11 +220,12 @@ class AzmanPanelMainScreen(Screen):
     
     # --- LOGIKA DLA BUKIETÓW IPTV PL ---
     def open_iptv_bouquet_manager(self, *args):
-        self.current_worker = IptvBouquetListWorker(constants.IPTV_SETTINGS_LIST_URL, callback_finished=self.on_iptv_bouquet_list_downloaded)
+        self.current_worker = IptvBouquetListWorker(constants.IPTV_SETTINGS_LIST_URL, callback_finished=self.on_iptv_bouquet_list_downloaded, manifest_url=constants.IPTV_SETTINGS_MANIFEST_URL)
         self.current_worker.start()
 
-    def on_iptv_bouquet_list_downloaded(self, error_message, bouquet_filenames):
+    def on_iptv_bouquet_list_downloaded(self, error_message, bouquet_filenames, manifest):
         self.current_worker = None
+        self.bouquet_manifest = manifest
         if error_message or not bouquet_filenames:
             msg = error_message or "Nie znaleziono bukietów na serwerze."
             self.session.open(MessageBox, msg, MessageBox.TYPE_ERROR)
@@ -243,12 +241,7 @@ class AzmanPanelMainScreen(Screen):
                 item_list,
                 on_save_callback=self.on_iptv_bouquets_selected
             )
-        self.open_timer = eTimer()
-        try:
-            self.open_timer_conn = self.open_timer.timeout.connect(open_select_list_screen)
-        except:
-            self.open_timer.callback.append(open_select_list_screen)
-        self.open_timer.start(1, True)
+        tasks.dispatcher.post(open_select_list_screen)
     
     def on_iptv_bouquets_selected(self, selected_bouquets):
         if not selected_bouquets: return
@@ -257,7 +250,8 @@ class AzmanPanelMainScreen(Screen):
             selected_bouquets=selected_bouquets,
             base_url=constants.IPTV_SETTINGS_BASE_URL,
             callback_progress=self.progress_screen.setProgress,
-            callback_finished=self.on_iptv_bouquet_installation_finished
+            callback_finished=self.on_iptv_bouquet_installation_finished,
+            manifest=self.bouquet_manifest
         )
         self.progress_screen.parent_worker = self.current_worker
         self.current_worker.start()
@@ -279,11 +273,12 @@ class AzmanPanelMainScreen(Screen):
 
     # --- LOGIKA DLA BUKIETÓW FAST ---
     def open_fast_bouquet_manager(self, *args):
-        self.current_worker = IptvBouquetListWorker(constants.FAST_SETTINGS_LIST_URL, callback_finished=self.on_fast_bouquet_list_downloaded)
+        self.current_worker = IptvBouquetListWorker(constants.FAST_SETTINGS_LIST_URL, callback_finished=self.on_fast_bouquet_list_downloaded, manifest_url=constants.FAST_SETTINGS_MANIFEST_URL)
         self.current_worker.start()
         
-    def on_fast_bouquet_list_downloaded(self, error_message, bouquet_filenames):
+    def on_fast_bouquet_list_downloaded(self, error_message, bouquet_filenames, manifest):
         self.current_worker = None
+        self.bouquet_manifest = manifest
         if error_message or not bouquet_filenames:
             msg = error_message or "Nie znaleziono bukietów FAST na serwerze."
             self.session.open(MessageBox, msg, MessageBox.TYPE_ERROR)
@@ -299,12 +294,7 @@ class AzmanPanelMainScreen(Screen):
                 item_list,
                 on_save_callback=self.on_fast_bouquets_selected
             )
-        self.open_timer = eTimer()
-        try:
-            self.open_timer_conn = self.open_timer.timeout.connect(open_select_list_screen)
-        except:
-            self.open_timer.callback.append(open_select_list_screen)
-        self.open_timer.start(1, True)
+        tasks.dispatcher.post(open_select_list_screen)
         
     def on_fast_bouquets_selected(self, selected_bouquets):
         if not selected_bouquets: return
@@ -313,7 +303,8 @@ class AzmanPanelMainScreen(Screen):
             selected_bouquets=selected_bouquets,
             base_url=constants.FAST_SETTINGS_BASE_URL,
             callback_progress=self.progress_screen.setProgress,
-            callback_finished=self.on_fast_bouquet_installation_finished
+            callback_finished=self.on_fast_bouquet_installation_finished,
+            manifest=self.bouquet_manifest
         )
         self.progress_screen.parent_worker = self.current_worker
         self.current_worker.start()
@@ -333,6 +324,28 @@ class AzmanPanelMainScreen(Screen):
             type=MessageBox.TYPE_INFO
         )
 
+    # --- LOGIKA DLA TESTU STRUMIENI ---
+    def start_stream_probe(self):
+        options = [("Sprawdź i pokaż raport", False), ("Sprawdź i utwórz bukiet niedziałających kanałów", True)]
+        self.session.openWithCallback(self._on_stream_probe_choice, ChoiceBox, title="Test strumieni IPTV z zainstalowanych bukietów", list=options)
+
+    def _on_stream_probe_choice(self, choice):
+        if not choice: return
+        self.progress_screen = self.session.open(DownloadProgressScreen, title="Sprawdzanie strumieni...")
+        self.current_worker = StreamProbeWorker(callback_progress=self.progress_screen.setProgress, callback_finished=self.on_stream_probe_finished, write_dead_bouquet=choice[1])
+        self.progress_screen.parent_worker = self.current_worker
+        self.current_worker.start()
+
+    def on_stream_probe_finished(self, error_message, report):
+        self.current_worker = None
+        if hasattr(self, 'progress_screen') and self.progress_screen:
+            self.progress_screen.close()
+            self.progress_screen = None
+        if error_message or report is None:
+            self.session.open(MessageBox, error_message or "Sprawdzanie przerwane.", type=MessageBox.TYPE_ERROR)
+            return
+        self.session.open(StreamProbeReportScreen, report)
+
     # --- LOGIKA DLA EPG SOURCES ---
     def start_epg_download(self):
         message = f"Czy chcesz pobrać i nadpisać plik:\n'{constants.SOURCES_XML_FILENAME}'\n\nw lokalizacji:\n'{constants.SOURCES_XML_TARGET_DIR}'?"
@@ -1,31 +1,119 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import yt_dlp
 import json
-import requests
-from urllib.parse import quote
+import urllib.request
+from urllib.parse import quote, unquote
 import os
+import re
 import sys
+import time
+import socket
+import argparse
+import threading
+import contextlib
+import socketserver
+import queue
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 # Przekierowujemy stderr do dev/null, aby ukryć błędy yt-dlp w konsoli
 sys.stderr = open(os.devnull, 'w')
 
-def get_m3u8_for_video(video_url: str) -> str or None:
-    print("    -> Pozyskuję link M3U8...", end='', flush=True)
-    ydl_opts = {'quiet': True, 'no_warnings': True, 'get_url': True, 'format': 'best[protocol=m3u8_native]'}
+# Równoległe skanowanie kanałów - czas pracy wyznacza najwolniejszy kanał, a nie suma wszystkich
+MAX_PARALLEL_CHANNELS = 4
+CHANNEL_TIMEOUT = 120  # sekundy na cały kanał
+SOCKET_TIMEOUT = 15    # sekundy na pojedyncze połączenie yt-dlp
+
+# yt_dlp i requests importowane są dopiero, gdy są potrzebne - sam klient usługi startuje bez nich
+yt_dlp = None
+requests = None
+
+def load_yt_dlp():
+    global yt_dlp
+    if yt_dlp is None:
+        import yt_dlp as module
+        yt_dlp = module
+    return yt_dlp
+
+def load_requests():
+    global requests
+    if requests is None:
+        import requests as module
+        requests = module
+    return requests
+
+# Rezydentna usługa (--daemon): yt_dlp załadowany raz, zlecenia przez gniazdo Unix
+SOCKET_PATH = '/tmp/azman_yt_resolver.sock'
+CLIENT_CONNECT_TIMEOUT = 2
+# Usługa wysyła log po każdym kanale; dłuższa cisza oznacza, że utknęła - klient wykonuje wtedy pracę sam
+CLIENT_READ_TIMEOUT = CHANNEL_TIMEOUT + 60
+
+# Jedno przejście: link m3u8 z listy formatów zwróconej już przy skanowaniu /live (bez drugiego extract_info)
+SINGLE_PASS = True
+M3U8_PROTOCOLS = ('m3u8_native', 'm3u8')
+
+YDL_PROFILES = {
+    'scan': {'quiet': True, 'no_warnings': True, 'socket_timeout': SOCKET_TIMEOUT},
+    'm3u8': {'quiet': True, 'no_warnings': True, 'get_url': True, 'format': 'best[protocol=m3u8_native]', 'socket_timeout': SOCKET_TIMEOUT},
+    # Lekkie sprawdzenie /live: bez rozwiązywania formatów i bez wchodzenia w poszczególne filmy
+    'probe': {'quiet': True, 'no_warnings': True, 'extract_flat': True, 'socket_timeout': SOCKET_TIMEOUT},
+}
+
+# Tryb --refresh: linki m3u8 YouTube wygasają (parametr expire); odświeżamy tylko te bliskie wygaśnięcia
+STATE_FILE = '/var/cache/azmanpanel/yt_streams.json'
+REFRESH_MARGIN = 90 * 60  # sekundy przed wygaśnięciem, od których link jest rozwiązywany ponownie
+EXPIRE_RE = re.compile(r'(?:/expire/|[?&]expire=)(\d+)')
+VIDEO_ID_RE = re.compile(r'(?:/id/|[?&]id=)([\w-]{11})')
+
+# Pamięć kanałów: kanał bez transmisji jest sprawdzany coraz rzadziej (30 min, 1 h, 2 h... do 12 h)
+BACKOFF_BASE = 30 * 60
+BACKOFF_MAX = 12 * 3600
+VIDEO_ID_TTL = 48 * 3600  # jak długo pamiętamy identyfikatory ostatnio widzianych transmisji
+
+# Kod wyjścia, gdy bukiet nie zmienił się - wywołujący może pominąć przeładowanie listy kanałów
+EXIT_UNCHANGED = 3
+EXIT_FAILED = 1  # nic nie zrobiono (brak konfiguracji z GitHuba i brak zapisanego stanu) albo błąd usługi
+
+# --reload (cron): enigma2 trzyma bukiety w pamięci, więc po zmianie pliku prosimy OpenWebif o przeładowanie
+# bukietów (tryb 2, jak servicelist.HTTP_RELOAD_URL we wtyczce - skrypt działa poza procesem enigmy)
+RELOAD_URL = 'http://127.0.0.1/api/servicelistreload?mode=2'
+RELOAD_TIMEOUT = 10
+_ydl_local = threading.local()
+
+def get_ydl(profile: str = 'scan'):
+    """
+    Skonfigurowany YoutubeDL wielokrotnego użytku - jeden na wątek i profil (instancja nie jest
+    bezpieczna wątkowo), zamiast nowej instancji dla każdego kanału i każdego filmu.
+    """
+    instances = getattr(_ydl_local, 'instances', None)
+    if instances is None:
+        instances = _ydl_local.instances = {}
+    if profile not in instances:
+        instances[profile] = load_yt_dlp().YoutubeDL(YDL_PROFILES[profile])
+    return instances[profile]
+
+def pick_m3u8_format(info: dict) -> str or None:
+    """Odpowiednik 'best[protocol=m3u8_native]' wybrany z formatów, które już mamy w wyniku ekstrakcji."""
+    candidates = [f for f in info.get('formats') or [] if f.get('protocol') in M3U8_PROTOCOLS and f.get('url')
+                  and f.get('vcodec') != 'none' and f.get('acodec') != 'none']
+    if not candidates:
+        return info.get('url') if info.get('protocol') in M3U8_PROTOCOLS else None
+    # Preferujemy m3u8_native jak dotychczasowy selektor, potem rozdzielczość i bitrate
+    best = max(candidates, key=lambda f: (f.get('protocol') == 'm3u8_native', f.get('height') or 0, f.get('tbr') or 0))
+    return best['url']
+
+def get_m3u8_for_video(video_url: str, log=print) -> str or None:
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            m3u8 = info.get('url')
-            if m3u8:
-                print(" [OK]")
-                return m3u8
-            else:
-                print(" [BŁĄD]")
-                return None
+        info = get_ydl('m3u8').extract_info(video_url, download=False)
+        m3u8 = info.get('url')
+        if m3u8:
+            log("    -> Pozyskuję link M3U8... [OK]")
+            return m3u8
+        else:
+            log("    -> Pozyskuję link M3U8... [BŁĄD]")
+            return None
     except Exception:
-        print(" [BŁĄD]")
+        log("    -> Pozyskuję link M3U8... [BŁĄD]")
         return None
 
 # --- PRZYWRÓCONA FUNKCJA REKURSYWNA ---
@@ -41,39 +129,258 @@ def _recursive_find_live_videos(data_structure):
             live_videos.extend(_recursive_find_live_videos(item))
     return live_videos
 
-def find_active_streams_on_channel(channel_url: str) -> list:
+def find_active_streams_on_channel(channel_url: str, log=print) -> list:
     live_section_url = channel_url.rstrip('/') + '/live'
-    print(f"  -> Skanuję...", end='', flush=True)
-    ydl_opts = {'quiet': True, 'no_warnings': True}
     active_streams = []
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            live_info = ydl.extract_info(live_section_url, download=False)
-            
-            # --- ZMIANA: UŻYWAMY SKUTECZNIEJSZEJ METODY REKURSYWNEJ ---
-            found_videos = _recursive_find_live_videos(live_info)
-            unique_videos = list({video.get('webpage_url'): video for video in found_videos}.values())
-
-            if not unique_videos:
-                print(" [BRAK LIVE]")
-                return []
-            
-            print("") # Nowa linia dla czytelności
-            for video_entry in unique_videos:
-                video_title = video_entry.get('title', 'Brak tytułu')
-                video_url = video_entry.get('webpage_url')
-                print(f"  -> Znaleziono transmisję: '{video_title}'")
-                m3u8_link = get_m3u8_for_video(video_url)
-                if m3u8_link:
-                    active_streams.append({'title': video_title, 'm3u8_url': m3u8_link})
+        live_info = get_ydl('scan').extract_info(live_section_url, download=False)
+        
+        # --- ZMIANA: UŻYWAMY SKUTECZNIEJSZEJ METODY REKURSYWNEJ ---
+        found_videos = _recursive_find_live_videos(live_info)
+        unique_videos = list({video.get('webpage_url'): video for video in found_videos}.values())
+
+        if not unique_videos:
+            log("  -> Skanuję... [BRAK LIVE]")
+            return []
+        
+        log("  -> Skanuję...")
+        for video_entry in unique_videos:
+            video_title = video_entry.get('title', 'Brak tytułu')
+            video_url = video_entry.get('webpage_url')
+            log(f"  -> Znaleziono transmisję: '{video_title}'")
+            # Wpisy z listy (kilka transmisji naraz) bywają płaskie, bez formatów - wtedy druga ekstrakcja
+            m3u8_link = pick_m3u8_format(video_entry) if SINGLE_PASS else None
+            if m3u8_link:
+                log("    -> Link M3U8 z pierwszej ekstrakcji [OK]")
+            else:
+                m3u8_link = get_m3u8_for_video(video_url, log)
+            if m3u8_link:
+                active_streams.append({'title': video_title, 'm3u8_url': m3u8_link, 'video_url': video_url, 'video_id': video_entry.get('id')})
     except yt_dlp.utils.DownloadError:
-        print(" [BRAK LIVE]")
+        log("  -> Skanuję... [BRAK LIVE]")
     except Exception:
-        print(" [BŁĄD KRYTYCZNY]")
+        log("  -> Skanuję... [BŁĄD KRYTYCZNY]")
+        return None  # błąd to nie to samo co brak transmisji - nie wpływa na pamięć kanału
     return active_streams
 
+def run_channel_job(name_prefix: str, job, started_at: dict):
+    """Wykonuje zadanie jednego kanału w wątku puli; komunikaty zbierane są w liście i drukowane w kolejności kanałów."""
+    started_at[name_prefix] = time.monotonic()
+    log_lines = [f"\n--- Przetwarzanie kanału: {name_prefix} ---"]
+    result = job(log_lines.append)
+    return log_lines, result
+
+def run_channel_jobs(jobs: list, max_workers: int = MAX_PARALLEL_CHANNELS) -> list:
+    """
+    Wykonuje zadania kanałów (nazwa, funkcja(log)) równolegle; zwraca listę (nazwa, wynik) w kolejności
+    zadań, niezależnie od kolejności zakończenia. Kanał przetwarzany dłużej niż CHANNEL_TIMEOUT daje wynik None.
+    Wątki są demonami: porzucony kanał nie wstrzymuje zakończenia skryptu (ThreadPoolExecutor dołącza swoje
+    wątki przy wyjściu interpretera, więc CHANNEL_TIMEOUT nie ograniczałby czasu pracy). W miejsce wątku
+    z porzuconym kanałem startuje nowy, więc kanały w kolejce ruszają nawet wtedy, gdy wszystkie wątki utknęły.
+    """
+    pending = queue.Queue()
+    started_at = {}
+    abandoned = set()
+    futures = []
+    for name, job in jobs:
+        future = Future()
+        futures.append((name, future))
+        pending.put((name, job, future))
+
+    def worker():
+        while True:
+            try:
+                name, job, future = pending.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel(): continue
+            try:
+                future.set_result(run_channel_job(name, job, started_at))
+            except Exception as e:
+                future.set_exception(e)
+            if name in abandoned: return  # ten wątek ma już następcę - nie przekraczamy max_workers
+
+    def start_worker():
+        threading.Thread(target=worker, daemon=True).start()
+
+    for _ in range(min(max_workers, len(jobs))):
+        start_worker()
+    results = []
+    try:
+        for name, future in futures:
+            try:
+                while True:
+                    try:
+                        log_lines, result = future.result(timeout=1)
+                        break
+                    except FutureTimeoutError:
+                        # Limit liczony od faktycznego startu kanału, nie od czekania w kolejce puli
+                        if name in started_at and time.monotonic() - started_at[name] > CHANNEL_TIMEOUT:
+                            raise
+            except FutureTimeoutError:
+                abandoned.add(name)
+                if not pending.empty(): start_worker()
+                log_lines, result = [f"\n--- Przetwarzanie kanału: {name} ---", "  -> Przekroczono limit czasu, pomijam."], None
+            except Exception:
+                log_lines, result = [f"\n--- Przetwarzanie kanału: {name} ---", "  -> Skanuję... [BŁĄD KRYTYCZNY]"], None
+            print("\n".join(log_lines), flush=True)
+            results.append((name, result))
+    finally:
+        # Kanały, na które nikt już nie czeka, nie startują; pominięty kanał kończy się sam w swoim wątku
+        for _, future in futures:
+            future.cancel()
+    return results
+
+def scan_channels(channels_to_process: list, max_workers: int = MAX_PARALLEL_CHANNELS, known=None) -> list:
+    """
+    Pełne skanowanie kanałów równolegle; zwraca listę (nazwa, transmisje) w kolejności z pliku konfiguracyjnego.
+    Transmisje to None, gdy kanału nie udało się sprawdzić (błąd lub limit czasu).
+    known: nazwa -> (ważne wpisy z poprzedniego uruchomienia, ostatnio widziane ID) - patrz scan_channel.
+    """
+    known = known or {}
+    jobs = [(name, lambda log, name=name, url=url: scan_channel(url, *known.get(name, ([], {})), log=log)) for name, url in channels_to_process]
+    return run_channel_jobs(jobs, max_workers)
+
+def scan_channel(channel_url: str, previous: list, seen_ids: dict, log=print):
+    """
+    Skan jednego kanału. Gdy na /live są wyłącznie transmisje, które już znamy (ID w pamięci kanału)
+    i których linki są jeszcze ważne, zamiast ponownej ekstrakcji formatów zwracamy poprzednie wpisy.
+    """
+    valid = dict((r['video_id'], r) for r in previous if r.get('video_id') in seen_ids and r['expire'] and r['expire'] - time.time() > REFRESH_MARGIN)
+    if valid:
+        ids = live_video_ids(channel_url)
+        if ids and ids <= set(valid):
+            log(f"  -> Znane transmisje ({len(ids)}), linki ważne - pomijam ekstrakcję [OK]")
+            return [valid[video_id] for video_id in sorted(ids)]
+    return find_active_streams_on_channel(channel_url, log)
+
+class ChannelCache(object):
+    """
+    Pamięć kanałów między uruchomieniami: identyfikatory ostatnio widzianych transmisji (z TTL)
+    i termin następnego sprawdzenia - kanały, które rzadko nadają, są sprawdzane coraz rzadziej.
+    """
+    def __init__(self, channels=None, now=None):
+        self.now = now or time.time()
+        self.channels = {}
+        for name, entry in (channels or {}).items():
+            entry['video_ids'] = dict((video_id, seen) for video_id, seen in entry.get('video_ids', {}).items() if self.now - seen < VIDEO_ID_TTL)
+            self.channels[name] = entry
+
+    def is_due(self, name: str) -> bool:
+        return self.channels.get(name, {}).get('next_check', 0) <= self.now
+
+    def minutes_to_check(self, name: str) -> int:
+        return max(0, int((self.channels[name]['next_check'] - self.now) / 60))
+
+    def update(self, name: str, streams):
+        if streams is None: return
+        entry = self.channels.setdefault(name, {'misses': 0, 'video_ids': {}})
+        entry['last_checked'] = self.now
+        if streams:
+            entry.update(misses=0, last_live=self.now, next_check=self.now)
+            for stream in streams:
+                if stream.get('video_id'): entry['video_ids'][stream['video_id']] = self.now
+        else:
+            entry['misses'] = entry.get('misses', 0) + 1
+            entry['next_check'] = self.now + min(BACKOFF_BASE * 2 ** (entry['misses'] - 1), BACKOFF_MAX)
+
+# --- Stan transmisji i odświeżanie linków przed wygaśnięciem ---
+
+def parse_stream_url(m3u8_url: str):
+    """(expire, video_id) z linku manifestu YouTube; brakujące wartości jako None."""
+    expire = EXPIRE_RE.search(m3u8_url)
+    video_id = VIDEO_ID_RE.search(m3u8_url)
+    return (int(expire.group(1)) if expire else None), (video_id.group(1) if video_id else None)
+
+def make_record(channel: str, channel_url: str, stream: dict) -> dict:
+    expire, url_video_id = parse_stream_url(stream['m3u8_url'])
+    video_id = stream.get('video_id') or url_video_id
+    video_url = stream.get('video_url') or (f"https://www.youtube.com/watch?v={video_id}" if video_id else None)
+    return {'channel': channel, 'channel_url': channel_url, 'title': stream['title'], 'video_id': video_id,
+            'video_url': video_url, 'm3u8_url': stream['m3u8_url'], 'expire': expire}
+
+def load_state() -> dict:
+    try:
+        with open(STATE_FILE, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_state(records: list, cache: ChannelCache):
+    try:
+        os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+        tmp_path = STATE_FILE + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'updated': int(time.time()), 'streams': records, 'channels': cache.channels}, f, ensure_ascii=False)
+        os.replace(tmp_path, STATE_FILE)
+    except OSError:
+        # Bez stanu --refresh odtworzy wpisy z samego bukietu
+        print(f"Nie można zapisać stanu transmisji: {STATE_FILE}")
+
+def records_from_bouquet(filepath: str, channels_to_process: list) -> list:
+    """Odtwarza stan z istniejącego bukietu (np. po pierwszej aktualizacji skryptu) - nazwa to 'Kanał - tytuł'."""
+    channel_urls = dict(channels_to_process)
+    records = []
+    try:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    for line in lines:
+        if not line.startswith('#SERVICE 4097:'): continue
+        fields = line[9:].split(':')
+        if len(fields) < 12: continue
+        m3u8_url, full_name = unquote(fields[10]), ':'.join(fields[11:])
+        channel, _, title = full_name.partition(' - ')
+        records.append(make_record(channel, channel_urls.get(channel), {'title': title or full_name, 'm3u8_url': m3u8_url}))
+    return records
+
+def live_video_ids(channel_url: str):
+    """Identyfikatory transmisji widocznych na /live - bez ekstrakcji formatów. None, gdy nie da się ustalić."""
+    try:
+        info = get_ydl('probe').extract_info(channel_url.rstrip('/') + '/live', download=False, process=False)
+    except yt_dlp.utils.DownloadError:
+        return set()  # kanał nie nadaje
+    except Exception:
+        return None
+    ids = set()
+    for entry in [info] + list(info.get('entries') or []):
+        if not isinstance(entry, dict): continue
+        if entry.get('_type') in ('url', 'url_transparent'):
+            match = re.search(r'(?:v=|/)([\w-]{11})(?:[?&#]|$)', entry.get('url') or '')
+            if match: ids.add(match.group(1))
+        elif entry.get('is_live') or entry.get('live_status') == 'is_live':
+            if entry.get('id'): ids.add(entry['id'])
+    return ids
+
+def refresh_channel(channel: str, channel_url: str, records: list, log) -> list:
+    """Odświeża transmisje jednego kanału: nowe - pełny skan, zakończone - usuwane, bliskie wygaśnięcia - nowy link."""
+    ids = live_video_ids(channel_url) if channel_url else None
+    known_ids = set(r['video_id'] for r in records)
+    if ids is not None and ids - known_ids:
+        log(f"  -> Nowe transmisje ({len(ids - known_ids)}), pełne skanowanie...")
+        streams = find_active_streams_on_channel(channel_url, log)
+        return None if streams is None else [make_record(channel, channel_url, s) for s in streams]
+    refreshed = []
+    for record in records:
+        if ids is not None and record['video_id'] not in ids:
+            log(f"  -> Transmisja zakończona: '{record['title']}'")
+            continue
+        if record['expire'] and record['expire'] - time.time() > REFRESH_MARGIN:
+            refreshed.append(record)
+            continue
+        log(f"  -> Link wygasa, odświeżam: '{record['title']}'")
+        m3u8_link = get_m3u8_for_video(record['video_url'], log) if record['video_url'] else None
+        if m3u8_link:
+            refreshed.append(make_record(channel, channel_url, dict(record, m3u8_url=m3u8_link)))
+    if not refreshed and not records:
+        log("  -> Skanuję... [BRAK LIVE]")
+    return refreshed
+
 def get_channels_from_github(url: str):
     print(f"Pobieram plik konfiguracyjny...", end='', flush=True)
+    load_requests()
     try:
         response = requests.get(url, timeout=15)
         response.raise_for_status()
@@ -84,53 +391,278 @@ def get_channels_from_github(url: str):
         print(" [BŁĄD]")
         return None
 
-def create_bouquet_from_channels(config_data: dict, output_filepath: str):
+def create_bouquet_from_channels(config_data: dict, output_filepath: str, force: bool = False):
+    """Pełne skanowanie; zwraca (liczba transmisji, czy bukiet się zmienił)."""
     print("\nRozpoczynam tworzenie bukietu...")
     if not config_data:
         print("Brak danych konfiguracyjnych. Zamykam skrypt.")
-        return 0
+        return 0, False
         
+    state = load_state()
+    cache = ChannelCache(state.get('channels'))
+    previous = {}
+    for record in state.get('streams', []):
+        previous.setdefault(record['channel'], []).append(record)
+    channels_to_process = channels_from_config(config_data)
+    due, deferred = [], []
+    for name, url in channels_to_process:
+        (due if force or cache.is_due(name) else deferred).append((name, url))
+    for name, _ in deferred:
+        print(f"\n--- Pomijam kanał: {name} (rzadko nadaje, kolejne sprawdzenie za {cache.minutes_to_check(name)} min) ---")
+    print(f"Skanuję {len(due)} z {len(channels_to_process)} kanałów (równolegle: {MAX_PARALLEL_CHANNELS})...", flush=True)
+    known = {} if force else dict((name, (previous.get(name, []), cache.channels.get(name, {}).get('video_ids', {}))) for name, _ in due)
+    scanned = dict(scan_channels(due, known=known))
+    channel_urls = dict(channels_to_process)
+    records = []
+    for name, url in channels_to_process:
+        if name not in scanned:
+            continue  # kanał odroczony - ostatnio nie nadawał
+        streams = scanned[name]
+        cache.update(name, streams)
+        if streams is None:
+            # Nie udało się sprawdzić - zostają dotychczasowe, jeszcze ważne linki kanału
+            records.extend(r for r in previous.get(name, []) if not r['expire'] or r['expire'] > cache.now)
+        else:
+            records.extend(make_record(name, channel_urls[name], stream) for stream in streams)
+    save_state(records, cache)
+    return write_bouquet(records, output_filepath)
+
+def refresh_bouquet(config_data: dict, output_filepath: str):
+    """Tryb --refresh: bez pełnego skanu, tylko lekkie sprawdzenie /live i nowe linki dla wygasających transmisji."""
+    print("\nOdświeżam istniejący bukiet...")
+    channels_to_process = channels_from_config(config_data)
+    state = load_state()
+    cache = ChannelCache(state.get('channels'))
+    records = state.get('streams') or records_from_bouquet(output_filepath, channels_to_process)
+    by_channel = {}
+    for record in records:
+        by_channel.setdefault(record['channel'], []).append(record)
+    # Kanały z konfiguracji (w jej kolejności) oraz te, które są tylko w stanie (np. brak dostępu do GitHuba)
+    order = channels_to_process + [(name, recs[0].get('channel_url')) for name, recs in by_channel.items() if name not in dict(channels_to_process)]
+    # Kanał bez transmisji sprawdzamy dopiero, gdy minie jego odroczenie
+    order = [(name, url) for name, url in order if by_channel.get(name) or cache.is_due(name)]
+    jobs = [(name, lambda log, name=name, url=url: refresh_channel(name, url, by_channel.get(name, []), log)) for name, url in order]
+    refreshed = []
+    for name, result in run_channel_jobs(jobs):
+        # Błąd lub limit czasu - zostawiamy dotychczasowe wpisy kanału
+        cache.update(name, result)
+        refreshed.extend(result if result is not None else by_channel.get(name, []))
+    save_state(refreshed, cache)
+    return write_bouquet(refreshed, output_filepath)
+
+def channels_from_config(config_data: dict) -> list:
     channels_to_process = []
-    for category in config_data.values():
+    for category in (config_data or {}).values():
         for channel in category:
             if 'name' in channel and 'url' in channel:
                 channels_to_process.append((channel['name'], channel['url']))
+    return channels_to_process
 
-    successful_channels_count = 0
-    with open(output_filepath, 'w', encoding='utf-8') as f_out:
-        f_out.write('#NAME Youtub Channels (YTtoM3U8 azman)\n')
-        
-        for name_prefix, url in channels_to_process:
-            print(f"\n--- Przetwarzanie kanału: {name_prefix} ---")
-            found_streams = find_active_streams_on_channel(url)
-            
-            for stream in found_streams:
-                full_name = f"{name_prefix} - {stream['title']}"
-                cleaned_name = full_name.replace(':', ' -')
-                m3u8_link = stream['m3u8_url']
-                encoded_m3u8 = quote(m3u8_link, safe='/')
-                
-                service_line = f"#SERVICE 4097:0:1:0:0:0:0:0:0:0:{encoded_m3u8}:{cleaned_name}\n"
-                description_line = f"#DESCRIPTION {cleaned_name}\n"
-                
-                f_out.write(service_line)
-                f_out.write(description_line)
-                successful_channels_count += 1
-                print("    -> Dodano do bukietu.")
-    return successful_channels_count
+def write_bouquet(records: list, output_filepath: str):
+    """
+    Zapisuje bukiet atomowo (plik tymczasowy + rename) i tylko wtedy, gdy treść się zmieniła.
+    Zwraca (liczba transmisji, czy bukiet się zmienił).
+    """
+    lines = ['#NAME Youtub Channels (YTtoM3U8 azman)']
+    for record in records:
+        full_name = f"{record['channel']} - {record['title']}"
+        cleaned_name = full_name.replace(':', ' -')
+        encoded_m3u8 = quote(record['m3u8_url'], safe='/')
+        lines.append(f"#SERVICE 4097:0:1:0:0:0:0:0:0:0:{encoded_m3u8}:{cleaned_name}")
+        lines.append(f"#DESCRIPTION {cleaned_name}")
+    content = '\n'.join(lines) + '\n'
+    try:
+        with open(output_filepath, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                print("Bukiet bez zmian - nie zapisuję.")
+                return len(records), False
+    except OSError:
+        pass
+    tmp_path = output_filepath + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f_out:
+        f_out.write(content)
+    os.replace(tmp_path, output_filepath)
+    return len(records), True
 
-if __name__ == "__main__":
-    github_config_url = 'https://raw.githubusercontent.com/azman26/azmanIPTVsettings/main/YTchannels.json'
-    output_bouquet_file = os.path.join('/etc/enigma2', 'userbouquet.iptv-yt-channels-azman.tv')
+GITHUB_CONFIG_URL = 'https://raw.githubusercontent.com/azman26/azmanIPTVsettings/main/YTchannels.json'
+OUTPUT_BOUQUET_FILE = os.path.join('/etc/enigma2', 'userbouquet.iptv-yt-channels-azman.tv')
 
-    config_data = get_channels_from_github(github_config_url)
+def run_update(refresh: bool = False, two_pass: bool = False, force: bool = False):
+    """Pełne skanowanie albo odświeżenie bukietu; zwraca (liczba transmisji lub -1, gdy nic nie zrobiono; czy bukiet się zmienił)."""
+    global SINGLE_PASS
+    SINGLE_PASS = not two_pass
+    load_yt_dlp()
+    config_data = get_channels_from_github(GITHUB_CONFIG_URL)
     
-    if config_data:
-        count = create_bouquet_from_channels(config_data, output_bouquet_file)
+    if refresh and (config_data or os.path.exists(STATE_FILE)):
+        count, changed = refresh_bouquet(config_data, OUTPUT_BOUQUET_FILE)
+        print("\n--- PODSUMOWANIE ---")
+        print(f"Zakończono odświeżanie. W bukiecie jest {count} transmisji.")
+    elif config_data:
+        count, changed = create_bouquet_from_channels(config_data, OUTPUT_BOUQUET_FILE, force)
         print("\n--- PODSUMOWANIE ---")
         print(f"Zakończono. Dodano {count} transmisji.")
-        print(f"Bukiet zapisano w: {output_bouquet_file}")
+    else:
+        print("\nBrak konfiguracji kanałów i zapisanego stanu - bukiet nie został utworzony.")
+        return -1, False
+    print(f"Bukiet zapisano w: {OUTPUT_BOUQUET_FILE}" if changed else "Bukiet nie zmienił się - przeładowanie listy kanałów nie jest potrzebne.")
+    return count, changed
+
+# --- Rezydentna usługa na gnieździe Unix ---
+# Protokół: jedno zlecenie JSON w linii, odpowiedź to linie JSON {"log": ...} zakończone {"result": ...} lub {"error": ...}.
+
+class _SocketWriter(object):
+    """Przekazuje wydruki skanowania do klienta linia po linii (konsola ekranu widzi postęp na bieżąco)."""
+    def __init__(self, send):
+        self.send = send
+        self.buffer = ''
+        self.connected = True
+
+    def write(self, text):
+        self.buffer += text
+        while '\n' in self.buffer:
+            line, self.buffer = self.buffer.split('\n', 1)
+            self.emit(line)
+        return len(text)
+
+    def emit(self, line):
+        if not self.connected: return
+        try:
+            self.send({'log': line})
+        except OSError:
+            self.connected = False  # klient zamknął okno - przebudowa i tak jest dokańczana
+
+    def flush(self):
+        pass
+
+class ResolverHandler(socketserver.StreamRequestHandler):
+    def send(self, message):
+        self.wfile.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8') or '{}')
+            command = request.get('cmd')
+            if command == 'ping':
+                self.send({'result': 'pong'})
+            elif command == 'resolve_channel':
+                log_lines = []
+                streams = find_active_streams_on_channel(request['url'], log_lines.append)
+                self.send({'result': streams, 'log_lines': log_lines})
+            elif command == 'resolve_video':
+                self.send({'result': get_m3u8_for_video(request['url'], lambda line: None)})
+            elif command == 'rebuild':
+                # Przebudowy wykonywane są pojedynczo - przekierowanie stdout jest globalne dla procesu
+                writer = _SocketWriter(self.send)
+                with self.server.rebuild_lock, contextlib.redirect_stdout(writer):
+                    count, changed = run_update(refresh=request.get('refresh', False), two_pass=request.get('two_pass', False), force=request.get('force', False))
+                if writer.buffer: writer.emit(writer.buffer)
+                self.send({'result': count, 'changed': changed})
+            elif command == 'shutdown':
+                self.send({'result': 'bye'})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+            else:
+                self.send({'error': f'Nieznane polecenie: {command}'})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # klient się rozłączył (np. zamknięto okno) - przebudowa i tak została dokończona
+        except Exception as e:
+            with contextlib.suppress(OSError):
+                self.send({'error': str(e)})
+
+class ResolverServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def run_daemon():
+    load_yt_dlp()
+    load_requests()
+    if os.path.exists(SOCKET_PATH):
+        if send_request({'cmd': 'ping'}, read_timeout=CLIENT_CONNECT_TIMEOUT) is not None:
+            print("Usługa już działa.")
+            return
+        os.remove(SOCKET_PATH)  # gniazdo po poprzednim, nieżyjącym procesie
+    old_umask = os.umask(0o077)
+    try:
+        server = ResolverServer(SOCKET_PATH, ResolverHandler)
+    finally:
+        os.umask(old_umask)
+    server.rebuild_lock = threading.Lock()
+    print(f"Usługa YT nasłuchuje na {SOCKET_PATH}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        with contextlib.suppress(OSError):
+            os.remove(SOCKET_PATH)
+
+def reload_bouquets():
+    """Przeładowanie bukietów w działającej enigmie przez OpenWebif; zwraca True przy powodzeniu."""
+    try:
+        urllib.request.urlopen(RELOAD_URL, timeout=RELOAD_TIMEOUT).read()
+        print("Przeładowano bukiety w enigmie.")
+        return True
+    except (OSError, ValueError) as e:
+        print(f"Nie udało się przeładować bukietów ({e}) - zmiany będą widoczne po przeładowaniu listy kanałów.")
+        return False
+
+def send_request(request: dict, on_log=None, read_timeout: float = CLIENT_READ_TIMEOUT):
+    """Wysyła zlecenie do usługi; zwraca odpowiedź końcową albo None, gdy usługa nie działa."""
+    if not os.path.exists(SOCKET_PATH): return None
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(CLIENT_CONNECT_TIMEOUT)
+        client.connect(SOCKET_PATH)
+        client.settimeout(read_timeout)  # limit na każdą linię odpowiedzi, nie na całą przebudowę
+        client.sendall((json.dumps(request) + '\n').encode('utf-8'))
+        for raw_line in client.makefile('rb'):
+            message = json.loads(raw_line.decode('utf-8'))
+            if 'log' in message:
+                if on_log: on_log(message['log'])
+                continue
+            return message
+    except socket.timeout:
+        print(f"Usługa nie odpowiada od {read_timeout} s.", flush=True)
+        return None
+    except (OSError, ValueError):
+        return None
+    finally:
+        client.close()
+    return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generuje bukiet z transmisjami live kanałów YouTube.")
+    parser.add_argument('--two-pass', action='store_true', help="osobna ekstrakcja linku m3u8 dla każdej transmisji (dawny tryb)")
+    parser.add_argument('--refresh', action='store_true', help="odśwież tylko wygasające linki i wykryj nowe/zakończone transmisje")
+    parser.add_argument('--force', action='store_true', help="skanuj wszystkie kanały, także odroczone (rzadko nadające)")
+    parser.add_argument('--daemon', action='store_true', help="uruchom rezydentną usługę z załadowanym yt_dlp")
+    parser.add_argument('--stop', action='store_true', help="zatrzymaj działającą usługę")
+    parser.add_argument('--status', action='store_true', help="sprawdź, czy usługa działa (kod wyjścia 0 = działa)")
+    parser.add_argument('--no-daemon', action='store_true', help="nie korzystaj z usługi, nawet jeśli działa")
+    parser.add_argument('--reload', action='store_true', help="po zmianie bukietu przeładuj bukiety w enigmie (uruchomienia z crona)")
+    args = parser.parse_args()
+    exit_code = 0
+
+    if args.daemon:
+        run_daemon()
+    elif args.stop or args.status:
+        response = send_request({'cmd': 'shutdown' if args.stop else 'ping'}, read_timeout=CLIENT_CONNECT_TIMEOUT)
+        print("Usługa działa." if response and args.status else ("Usługa zatrzymana." if response else "Usługa nie działa."))
+        exit_code = 0 if response else 1
+    else:
+        response = None if args.no_daemon else send_request({'cmd': 'rebuild', 'refresh': args.refresh, 'two_pass': args.two_pass, 'force': args.force}, on_log=lambda line: print(line, flush=True))
+        if response is None:
+            # Brak usługi - dotychczasowe jednorazowe uruchomienie w tym procesie
+            count, changed = run_update(refresh=args.refresh, two_pass=args.two_pass, force=args.force)
+            exit_code = EXIT_FAILED if count < 0 else (0 if changed else EXIT_UNCHANGED)
+        elif 'error' in response:
+            print(f"Błąd usługi: {response['error']}")
+            exit_code = EXIT_FAILED
+        else:
+            exit_code = EXIT_FAILED if response.get('result', 0) < 0 else (0 if response.get('changed') else EXIT_UNCHANGED)
+        if args.reload and exit_code == 0:
+            reload_bouquets()
     
     # Przywracamy stderr przed zakończeniem
     sys.stderr.close()
-    sys.stderr = sys.__stderr__
\ No newline at end of file
+    sys.stderr = sys.__stderr__
+    sys.exit(exit_code)
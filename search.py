@@ -0,0 +1,60 @@
+# /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/search.py
+
+import re
+
+TOKEN_RE = re.compile(r"[\w+.-]+", re.UNICODE)
+
+def _trigrams(text):
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+class SearchIndex(object):
+    """
+    Indeks wyszukiwania w pamięci dla list pakietów, picon i bukietów.
+    Dokument to krotka pól tekstowych (np. nazwa, opis). Frazy od 3 znaków szukane są
+    przez indeks trigramów, krótsze - przez słownik słów (zwykle dużo mniejszy niż lista dokumentów).
+    Wynikiem są numery dokumentów w kolejności rosnącej.
+    """
+    def __init__(self, documents):
+        self.documents = [tuple(field.lower() for field in doc) for doc in documents]
+        self.trigrams = {}
+        self.words = {}
+        for doc_id, doc in enumerate(self.documents):
+            for field in doc:
+                for gram in _trigrams(field):
+                    self.trigrams.setdefault(gram, set()).add(doc_id)
+                for word in TOKEN_RE.findall(field):
+                    self.words.setdefault(word, set()).add(doc_id)
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _candidates(self, token):
+        if len(token) >= 3:
+            candidates = None
+            for gram in _trigrams(token):
+                postings = self.trigrams.get(gram)
+                if not postings: return set()
+                candidates = set(postings) if candidates is None else candidates & postings
+            return candidates
+        candidates = set()
+        for word, postings in self.words.items():
+            if token in word: candidates |= postings
+        return candidates
+
+    def search(self, query, fields=None):
+        """Zwraca numery dokumentów zawierających wszystkie słowa zapytania (w wybranych polach)."""
+        tokens = query.lower().split()
+        if not tokens: return list(range(len(self.documents)))
+        result = None
+        for token in tokens:
+            candidates = self._candidates(token)
+            result = candidates if result is None else result & candidates
+            if not result: return []
+        # Weryfikacja - trigramy mogą dać fałszywe trafienia, a słowo może leżeć w innym polu
+        matches = []
+        for doc_id in sorted(result):
+            doc = self.documents[doc_id]
+            haystack = [doc[i] for i in fields] if fields is not None else doc
+            if all(any(token in field for field in haystack) for token in tokens):
+                matches.append(doc_id)
+        return matches
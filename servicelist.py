@@ -0,0 +1,109 @@
+# /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/servicelist.py
+
+import time
+import threading
+import urllib.request
+from . import utils, tasks
+
+# Zakres przeładowania - flagi łączone przy scalaniu żądań
+BOUQUETS = 1
+SERVICES = 2
+
+COALESCE_MS = 300
+HTTP_RELOAD_URL = "http://127.0.0.1/api/servicelistreload?mode=%d"
+HTTP_TIMEOUT = 5
+
+class ReloadResult(object):
+    def __init__(self, ok, method, seconds, scope, error=None):
+        self.ok = ok
+        self.method = method
+        self.seconds = seconds
+        self.scope = scope
+        self.error = error
+
+class ReloadTicket(object):
+    """Zgłoszenie przeładowania; wątek roboczy może poczekać na wynik przez wait()."""
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.result = None
+        self._done = threading.Event()
+
+    def _finish(self, result):
+        self.result = result
+        self._done.set()
+        if self.callback:
+            try:
+                self.callback(result)
+            except Exception as e:
+                utils.log_error(e, "ReloadTicket callback")
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.result
+
+class ReloadService(object):
+    """
+    Jedno miejsce przeładowania listy kanałów dla wszystkich workerów i ekranów. Żądania z dowolnego
+    wątku są kolejkowane, scalane w krótkim oknie i wykonywane w wątku głównym (tasks.dispatcher) przez eDVBDB.
+    Gdy zmieniły się tylko bukiety, przeładowywane są wyłącznie bukiety (bez lamedb).
+    Przez OpenWebif (HTTP) przeładowujemy tylko wtedy, gdy API enigmy jest niedostępne.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._scope = 0
+        self._tickets = []
+        self._pending_call = None
+
+    def request(self, scope=BOUQUETS, callback=None):
+        ticket = ReloadTicket(callback)
+        with self._lock:
+            self._scope |= scope
+            self._tickets.append(ticket)
+            # Każde kolejne żądanie przesuwa okno scalania
+            if self._pending_call: self._pending_call.cancel()
+            self._pending_call = tasks.dispatcher.post_later(COALESCE_MS, self._run_pending)
+        return ticket
+
+    def _run_pending(self):
+        with self._lock:
+            self._pending_call = None
+            scope, tickets = self._scope, self._tickets
+            self._scope, self._tickets = 0, []
+        if not tickets: return
+        result = self._reload(scope)
+        print(f"[AzmanPanel] Przeładowanie listy kanałów ({result.method}, zakres {scope}, zgłoszeń {len(tickets)}): {result.seconds:.2f} s" + ("" if result.ok else f" - błąd: {result.error}"))
+        for ticket in tickets:
+            ticket._finish(result)
+
+    def _reload(self, scope):
+        start = time.monotonic()
+        try:
+            db = self._dvbdb()
+        except (ImportError, AttributeError) as e:
+            utils.log_error(e, "eDVBDB niedostępne - przeładowanie przez HTTP")
+            return self._reload_http(scope, start)
+        try:
+            if scope & SERVICES:
+                db.reloadServicelist()
+            db.reloadBouquets()
+            return ReloadResult(True, "eDVBDB", time.monotonic() - start, scope)
+        except Exception as e:
+            utils.log_error(e, "ReloadService")
+            return ReloadResult(False, "eDVBDB", time.monotonic() - start, scope, str(e))
+
+    def _dvbdb(self):
+        from enigma import eDVBDB
+        db = eDVBDB.getInstance()
+        if db is None: raise AttributeError("eDVBDB.getInstance() zwróciło None")
+        return db
+
+    def _reload_http(self, scope, start):
+        # OpenWebif: mode 0 = lamedb i bukiety, mode 2 = tylko bukiety
+        try:
+            urllib.request.urlopen(HTTP_RELOAD_URL % (0 if scope & SERVICES else 2), timeout=HTTP_TIMEOUT).read()
+            return ReloadResult(True, "HTTP", time.monotonic() - start, scope)
+        except Exception as e:
+            utils.log_error(e, "ServicelistReload (HTTP)")
+            return ReloadResult(False, "HTTP", time.monotonic() - start, scope, str(e))
+
+reload_service = ReloadService()
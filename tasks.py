@@ -0,0 +1,124 @@
+# /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/tasks.py
+
+import time
+import heapq
+import threading
+import concurrent.futures
+from enigma import eTimer
+from . import constants, utils, throttle
+
+class CancellationToken(object):
+    """Flaga anulowania współdzielona między ekranem a zadaniem; wait() pozwala spać z możliwością przerwania."""
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise InterruptedError("Task cancelled")
+
+class DelayedCall(object):
+    __slots__ = ("due", "func", "args", "cancelled")
+
+    def __init__(self, due, func, args):
+        self.due = due
+        self.func = func
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def __lt__(self, other):
+        return self.due < other.due
+
+class MainThreadDispatcher(object):
+    """
+    Jedna kolejka wywołań do wątku głównego enigmy, opróżniana przez jeden eTimer.
+    Zwykłe wywołania (post) wykonywane są wszystkie i w kolejności zgłoszenia. Postęp (post_progress)
+    jest scalany per klucz - z serii szybkich aktualizacji zadania trafia na ekran tylko najnowsza.
+    post_later() zastępuje jednorazowe eTimery ekranów (np. opóźnione zamknięcie okna).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = []
+        self._progress = {}
+        self._delayed = []
+        self._scheduled = False
+        self.timer = eTimer()
+        self.timer.callback.append(self._drain)
+
+    def _wake(self):
+        # Wywoływane pod blokadą - timer startuje tylko raz na opróżnienie kolejki
+        if not self._scheduled:
+            self._scheduled = True
+            self.timer.start(0, True)
+
+    def _arm_delayed(self):
+        # Bez pilnych wywołań timer czeka do najbliższego opóźnionego
+        if self._delayed and not self._scheduled:
+            self.timer.start(max(0, int((self._delayed[0].due - time.monotonic()) * 1000)), True)
+
+    def post(self, func, *args):
+        with self._lock:
+            self._calls.append((func, args))
+            self._wake()
+
+    def post_progress(self, key, func, *args):
+        with self._lock:
+            self._progress[key] = (func, args)
+            self._wake()
+
+    def post_later(self, delay_ms, func, *args):
+        """Wywołuje func w wątku głównym po delay_ms; zwraca obiekt z cancel()."""
+        call = DelayedCall(time.monotonic() + delay_ms / 1000.0, func, args)
+        with self._lock:
+            heapq.heappush(self._delayed, call)
+            self._arm_delayed()
+        return call
+
+    def _drain(self):
+        self.timer.stop()
+        now = time.monotonic()
+        with self._lock:
+            self._scheduled = False
+            progress, self._progress = list(self._progress.values()), {}
+            calls, self._calls = self._calls, []
+            while self._delayed and self._delayed[0].due <= now:
+                call = heapq.heappop(self._delayed)
+                if not call.cancelled: calls.append((call.func, call.args))
+        # Postęp przed wywołaniami końcowymi - callback zakończenia zwykle zamyka ekran postępu
+        for func, args in progress + calls:
+            try:
+                func(*args)
+            except Exception as e:
+                utils.log_error(e, f"MainThreadDispatcher: {getattr(func, '__name__', func)}")
+        with self._lock:
+            self._arm_delayed()
+
+def _run_pooled(func, args):
+    try:
+        return func(*args)
+    finally:
+        # Wątek wraca do puli - zadanie tła mogło obniżyć jego priorytet CPU/I/O
+        throttle.restore_io_priority()
+
+class _Executor(object):
+    """Wspólna, ograniczona pula wątków dla workerów panelu."""
+    def __init__(self, max_workers):
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="AzmanPanel")
+
+    def submit(self, func, *args):
+        return self._pool.submit(_run_pooled, func, args)
+
+dispatcher = MainThreadDispatcher()
+executor = _Executor(constants.WORKER_POOL_SIZE)
@@ -0,0 +1,26 @@
+# Ładowanie modułów wtyczki poza odbiornikiem (bez enigmy - wymagany jest tylko Components.config).
+
+import os
+import sys
+import types
+import importlib
+import importlib.util
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def load_plugin_module(name):
+    if "Components.config" not in sys.modules:
+        # constants.py czyta config enigmy przy imporcie - poza odbiornikiem wystarczy pusty moduł
+        components = types.ModuleType("Components")
+        components_config = types.ModuleType("Components.config")
+        for attribute in ("config", "ConfigSubsection", "ConfigText", "configfile"):
+            setattr(components_config, attribute, None)
+        components.config = components_config
+        sys.modules.setdefault("Components", components)
+        sys.modules["Components.config"] = components_config
+    if "AzmanPanel" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("AzmanPanel", os.path.join(PLUGIN_DIR, "__init__.py"), submodule_search_locations=[PLUGIN_DIR])
+        package = importlib.util.module_from_spec(spec)
+        sys.modules["AzmanPanel"] = package
+    return importlib.import_module("AzmanPanel." + name)
@@ -0,0 +1,42 @@
+# Testy zapisu bouquets.tv (bouquets.write_bouquets_tv / register_bouquet).
+
+import os
+import shutil
+import tempfile
+import unittest
+from plugin_loader import load_plugin_module
+
+bouquets = load_plugin_module("bouquets")
+
+class BouquetsTvTest(unittest.TestCase):
+    def setUp(self):
+        self.settings_dir = tempfile.mkdtemp()
+        self.bouquets_tv = os.path.join(self.settings_dir, "bouquets.tv")
+        with open(self.bouquets_tv, "w", encoding="utf-8") as f:
+            f.write("#NAME Bukiety (TV) – ulubione\n" + bouquets.bouquet_line("userbouquet.favourites.tv") + "\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.settings_dir)
+
+    def read(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def test_register_keeps_utf8_header(self):
+        self.assertTrue(bouquets.register_bouquet(self.bouquets_tv, "userbouquet.dead.tv"))
+        self.assertFalse(bouquets.register_bouquet(self.bouquets_tv, "userbouquet.dead.tv"))
+        lines = self.read(self.bouquets_tv)
+        self.assertEqual(lines[0], "#NAME Bukiety (TV) – ulubione")
+        self.assertEqual(bouquets.registered_bouquets(self.bouquets_tv), ["userbouquet.favourites.tv", "userbouquet.dead.tv"])
+
+    def test_staged_copy_leaves_original_untouched(self):
+        original = self.read(self.bouquets_tv)
+        staged = os.path.join(self.settings_dir, "staged.tv")
+        self.assertTrue(bouquets.write_bouquets_tv(self.bouquets_tv, ["userbouquet.favourites.tv", "userbouquet.iptv.tv"], staged))
+        self.assertEqual(self.read(self.bouquets_tv), original)
+        self.assertEqual(self.read(staged), original + [bouquets.bouquet_line("userbouquet.iptv.tv")])
+        self.assertFalse(bouquets.write_bouquets_tv(self.bouquets_tv, ["userbouquet.favourites.tv"], staged + ".2"))
+        self.assertFalse(os.path.exists(staged + ".2"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+# Testy indeksu kanałów odbiornika (picons.ChannelIndex) na przykładowym lamedb.
+
+import os
+import shutil
+import tempfile
+import unittest
+from plugin_loader import load_plugin_module, FIXTURES_DIR
+
+picons = load_plugin_module("picons")
+
+class ChannelIndexLamedbTest(unittest.TestCase):
+    def setUp(self):
+        self.settings_dir = tempfile.mkdtemp()
+        shutil.copy(os.path.join(FIXTURES_DIR, "lamedb"), self.settings_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.settings_dir)
+
+    def test_every_service_is_indexed(self):
+        # Linie dostawcy (p:...,c:...) mają dużo dwukropków - nie mogą przesunąć odczytu kolejnych usług
+        index = picons.ChannelIndex.build(self.settings_dir)
+        self.assertEqual(index.refs, {
+            "1_0_19_DBE_437_71_820000_0_0_0",
+            "1_0_1_DBF_437_71_820000_0_0_0",
+            "1_0_1F_3DCD_1_13E_640000_0_0_0",
+            "1_0_16_1B1F_C3_13E_C00000_0_0_0",
+        })
+        self.assertEqual(index.snp, {"tvp1hd", "tvp1", "tvn", "polsat", "tv4"})
+
+    def test_wants_picons_of_indexed_channels(self):
+        index = picons.ChannelIndex.build(self.settings_dir)
+        self.assertTrue(index.wants("picon/1_0_1F_3DCD_1_13E_640000_0_0_0.png"))
+        self.assertTrue(index.wants("polsat.png"))
+        self.assertFalse(index.wants("1_0_1_FFFF_1_1_1_0_0_0.png"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# Testy prober.StreamProber na lokalnym serwerze HTTP.
+
+import time
+import threading
+import unittest
+import http.server
+from plugin_loader import load_plugin_module
+
+prober = load_plugin_module("prober")
+
+class StreamHandler(http.server.BaseHTTPRequestHandler):
+    slow_delay = 3.0
+    busy_delay = 0.3
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/vnd.apple.mpegurl", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/ok.m3u8":
+            self._send(200, b"#EXTM3U\n#EXT-X-VERSION:3\n")
+        elif self.path == "/missing.m3u8":
+            self._send(404, b"not found", "text/plain")
+        elif self.path == "/bad.m3u8":
+            self._send(200, b"<html>login</html>")
+        elif self.path == "/slow.m3u8":
+            time.sleep(self.slow_delay)
+            self._send(200, b"#EXTM3U\n")
+        elif self.path == "/redirect":
+            self._send(302, headers=[("Location", "/ok.m3u8")])
+        elif self.path.startswith("/busy/"):
+            time.sleep(self.busy_delay)
+            self._send(200, b"#EXTM3U\n")
+        else:
+            self._send(404)
+
+class StreamProberTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StreamHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_statuses(self):
+        urls = {name: self.base + path for name, path in (("ok", "/ok.m3u8"), ("missing", "/missing.m3u8"), ("bad", "/bad.m3u8"), ("slow", "/slow.m3u8"), ("redirect", "/redirect"))}
+        results = prober.StreamProber(concurrency=8, per_host=8, timeout=1).probe(urls.values())
+        self.assertTrue(results[urls["ok"]].ok)
+        self.assertTrue(results[urls["redirect"]].ok)
+        self.assertEqual(results[urls["missing"]].status, "HTTP 404")
+        self.assertEqual(results[urls["bad"]].status, "Niepoprawna playlista")
+        self.assertEqual(results[urls["slow"]].status, "Timeout")
+
+    def test_host_queue_does_not_count_against_timeout(self):
+        # 12 strumieni po 0.3 s przy 2 slotach na host to ~1.8 s kolejki - dłużej niż timeout pojedynczego sprawdzenia
+        urls = [f"{self.base}/busy/{i}.m3u8" for i in range(12)]
+        results = prober.StreamProber(concurrency=12, per_host=2, timeout=1).probe(urls)
+        self.assertTrue(all(result.ok for result in results.values()), [r.status for r in results.values()])
+        self.assertLess(max(result.latency_ms for result in results.values()), 1000)
+
+if __name__ == "__main__":
+    unittest.main()
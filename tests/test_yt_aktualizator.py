@@ -0,0 +1,53 @@
+# Testy równoległego przetwarzania kanałów w scripts/yt_aktualizator.py (bez yt_dlp i sieci).
+
+import os
+import sys
+import time
+import threading
+import importlib.util
+import unittest
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "yt_aktualizator.py")
+
+def load_script():
+    spec = importlib.util.spec_from_file_location("yt_aktualizator", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    stderr = sys.stderr
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        module.sys.stderr.close()  # skrypt wycisza stderr przy imporcie
+        sys.stderr = stderr
+    return module
+
+yt = load_script()
+
+class RunChannelJobsTest(unittest.TestCase):
+    def setUp(self):
+        self.release = threading.Event()
+        self.timeout = yt.CHANNEL_TIMEOUT
+        yt.CHANNEL_TIMEOUT = 1
+
+    def tearDown(self):
+        self.release.set()
+        yt.CHANNEL_TIMEOUT = self.timeout
+
+    def hang(self, log):
+        self.release.wait(30)
+        return ["za późno"]
+
+    def test_results_keep_job_order(self):
+        jobs = [(f"k{i}", lambda log, i=i: (time.sleep(0.05 * (5 - i)), i)[1]) for i in range(5)]
+        self.assertEqual(yt.run_channel_jobs(jobs, 3), [(f"k{i}", i) for i in range(5)])
+
+    def test_queued_channel_runs_when_all_workers_hang(self):
+        # Wywołanie w osobnym wątku - regresja ma skończyć się błędem testu, a nie zawieszeniem
+        results = []
+        runner = threading.Thread(target=lambda: results.extend(yt.run_channel_jobs([("hang1", self.hang), ("hang2", self.hang), ("quick", lambda log: ["ok"])], 2)), daemon=True)
+        runner.start()
+        runner.join(5)
+        self.assertFalse(runner.is_alive(), "run_channel_jobs nie zakończył się mimo limitu czasu kanałów")
+        self.assertEqual(results, [("hang1", None), ("hang2", None), ("quick", ["ok"])])
+
+if __name__ == "__main__":
+    unittest.main()
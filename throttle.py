@@ -0,0 +1,106 @@
+# /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/throttle.py
+
+import os
+import time
+import threading
+import subprocess
+from . import constants, utils
+from .config import config
+
+# Bufor zapisu - mniej, ale większych zapisów na HDD/USB w trakcie nagrywania
+WRITE_BUFFER_SIZE = 256 * 1024
+RECORDING_CHECK_INTERVAL = 5.0
+
+class TokenBucket(object):
+    """
+    Kubełek żetonów współdzielony przez wiele wątków. Rozliczenie "na kredyt": zużycie
+    odejmuje żetony od razu, a wątek śpi tyle, ile trzeba na spłatę długu przy aktualnej przepustowości.
+    """
+    def __init__(self, rate=0, burst_seconds=1.0):
+        self._lock = threading.Lock()
+        self.burst_seconds = burst_seconds
+        self.rate = rate
+        self._tokens = 0.0
+        self._stamp = time.monotonic()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self.rate = rate
+
+    def consume(self, amount):
+        with self._lock:
+            if self.rate <= 0: return  # bez limitu
+            now = time.monotonic()
+            capacity = self.rate * self.burst_seconds
+            self._tokens = min(capacity, self._tokens + (now - self._stamp) * self.rate) - amount
+            self._stamp = now
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0
+        if delay > 0: time.sleep(delay)
+
+def is_recording():
+    try:
+        import NavigationInstance
+        return bool(NavigationInstance.instance and NavigationInstance.instance.RecordTimer.isRecording())
+    except Exception:
+        return False
+
+class IoBudget(object):
+    """
+    Wspólny budżet sieci i zapisu dla instalacji w tle. Limity pochodzą z konfiguracji
+    i automatycznie zaostrzają się, gdy RecordTimer ma aktywne nagranie.
+    """
+    def __init__(self):
+        self.network = TokenBucket()
+        self.disk = TokenBucket()
+        self._checked_at = 0.0
+        self.recording = False
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked_at < RECORDING_CHECK_INTERVAL: return
+        self._checked_at = now
+        self.recording = is_recording()
+        settings = config.plugins.AzmanPanel
+        limit_kb = settings.io_limit_recording_kbps.value if self.recording else settings.io_limit_kbps.value
+        self.network.set_rate(limit_kb * 1024)
+        self.disk.set_rate(limit_kb * 1024)
+
+    def network_bytes(self, amount):
+        self._refresh()
+        self.network.consume(amount)
+
+    def disk_bytes(self, amount):
+        self._refresh()
+        self.disk.consume(amount)
+
+io_budget = IoBudget()
+
+_priority_state = threading.local()
+
+def _ionice(tid, io_class):
+    try:
+        subprocess.call(["ionice", "-c", io_class, "-p", str(tid)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError:
+        pass  # brak ionice w obrazie - zostaje sam priorytet CPU
+
+def lower_io_priority():
+    """Obniża priorytet CPU i I/O bieżącego wątku (w Linuksie nice i ionice działają per wątek)."""
+    tid = threading.get_native_id()
+    try:
+        if not hasattr(_priority_state, "nice"):
+            _priority_state.nice = os.getpriority(os.PRIO_PROCESS, tid)
+        os.setpriority(os.PRIO_PROCESS, tid, constants.BACKGROUND_NICE)
+    except OSError as e:
+        utils.log_error(e, "lower_io_priority: nice")
+    _ionice(tid, "3")
+
+def restore_io_priority():
+    """Przywraca priorytet sprzed lower_io_priority() - dla wątków z puli, które wykonają jeszcze inne zadania."""
+    if not hasattr(_priority_state, "nice"): return
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, _priority_state.nice)
+    except OSError as e:
+        utils.log_error(e, "restore_io_priority: nice")
+    del _priority_state.nice
+    _ionice(tid, "0")
@@ -1,19 +1,117 @@
 import os
+import json
+import codecs
+import socket
+import subprocess
+import collections
 # Usunięto 'import urllib.request', bo nie jest już potrzebny
 from Screens.Screen import Screen
 from Screens.MessageBox import MessageBox
-from Components.ActionMap import ActionMap
+from Screens.ChoiceBox import ChoiceBox
+from Components.ActionMap import ActionMap, NumberActionMap
 from Components.Label import Label
 from Components.MenuList import MenuList
 from Components.Sources.StaticText import StaticText
 from Components.ProgressBar import ProgressBar
 from Components.ScrollLabel import ScrollLabel
-from enigma import eConsoleAppContainer, eTimer, eDVBDB # <-- DODANO eDVBDB
-from . import constants
-from .workers import PackageListWorker
+from Tools.NumericalTextInput import NumericalTextInput
+from enigma import eConsoleAppContainer, eTimer
+from . import constants, utils, feed, servicelist, tasks
+from .config import config
+from .workers import PackageListWorker, InstalledPackagesWorker, IpkCacheWorker
+from .search import SearchIndex
 
 # --- Ekrany dla Azman OPKG Feed ---
 
+class ConsoleBuffer(object):
+    """
+    Bufor wyjścia polecenia dla Label/ScrollLabel. Dane trafiają do kolejki, a widżet odświeżany jest
+    eTimerem najwyżej co CONSOLE_REDRAW_MS; na ekranie zostaje ostatnie max_lines linii (bufor cykliczny).
+    Widok podąża za końcem wyjścia, dopóki użytkownik nie przewinie w górę (page_up/page_down).
+    Opcjonalnie całe wyjście zapisywane jest do pliku.
+    """
+    def __init__(self, widget, max_lines=constants.CONSOLE_MAX_LINES, redraw_ms=constants.CONSOLE_REDRAW_MS, log_path=None):
+        self.widget = widget
+        self.redraw_ms = redraw_ms
+        self.lines = collections.deque(maxlen=max_lines)
+        self.partial = ""
+        self.pending = []
+        self.dropped = 0
+        self.follow = True
+        self.stale = False
+        self.decoder = codecs.getincrementaldecoder("utf-8")("ignore")  # znak UTF-8 bywa rozcięty między porcjami
+        self.log_path = log_path
+        self.log_file = None
+        if log_path:
+            try:
+                self.log_file = open(log_path, "w", encoding="utf-8")
+            except OSError:
+                self.log_path = None
+        self.timer = eTimer()
+        self.timer.callback.append(self.flush)
+
+    def append_data(self, data):
+        if data: self.append(self.decoder.decode(data))
+
+    def append(self, text):
+        if not text: return
+        self.pending.append(text)
+        if self.log_file: self.log_file.write(text)
+        if not self.timer.isActive():
+            self.timer.start(self.redraw_ms, True)
+
+    def set_text(self, text):
+        self.lines.clear()
+        self.partial, self.pending, self.dropped = "", [], 0
+        self.follow = True
+        self.append(text)
+        self.flush()
+
+    def page_up(self):
+        self.follow = False
+        self.widget.pageUp()
+
+    def page_down(self):
+        position = getattr(self.widget, "curPos", None)
+        self.widget.pageDown()
+        # Powrót na koniec tekstu wznawia podążanie za wyjściem (starsze ScrollLabel nie mają isAtLastPage)
+        at_end = self.widget.isAtLastPage() if hasattr(self.widget, "isAtLastPage") else getattr(self.widget, "curPos", None) == position
+        if at_end and not self.follow:
+            self.follow = True
+            if self.stale: self.render()
+
+    def flush(self):
+        self.timer.stop()
+        if not self.pending: return
+        text = self.partial + "".join(self.pending).replace("\r\n", "\n").replace("\r", "\n")
+        self.pending = []
+        new_lines = text.split("\n")
+        self.partial = new_lines.pop()
+        overflow = len(self.lines) + len(new_lines) - self.lines.maxlen
+        if overflow > 0: self.dropped += overflow
+        self.lines.extend(new_lines)
+        if self.follow:
+            self.render()
+        else:
+            self.stale = True  # użytkownik czyta wcześniejsze linie - nie przesuwamy mu widoku
+
+    def render(self):
+        self.stale = False
+        header = ""
+        if self.dropped:
+            header = f"[... pominięto {self.dropped} wcześniejszych linii" + (f", pełny log: {self.log_path}" if self.log_path else "") + "]\n"
+        self.widget.setText(header + "\n".join(self.lines) + ("\n" + self.partial if self.partial else ""))
+        if hasattr(self.widget, "lastPage") and getattr(self.widget, "instance", None): self.widget.lastPage()
+
+    def close(self):
+        self.flush()
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+def console_log_path():
+    return constants.CONSOLE_LOG_PATH if config.plugins.AzmanPanel.console_log_to_file.value else None
+
 class OpkgCommandScreen(Screen):
     def __init__(self, session, command, title="", callback=None):
         Screen.__init__(self, session)
@@ -22,47 +120,98 @@ class OpkgCommandScreen(Screen):
         self.setTitle(title)
         self["console"] = Label()
         self["actions"] = ActionMap(["OkCancelActions"], {"ok": self.close, "cancel": self.close}, -1)
+        # Label nie przewija - pokazujemy tyle ostatnich linii, ile mieści się na ekranie
+        self.console = ConsoleBuffer(self["console"], max_lines=26, log_path=console_log_path())
+        self.close_call = None
         self.console_app = eConsoleAppContainer()
         self.console_app.dataAvail.append(self.on_console_data)
         self.console_app.appClosed.append(self.on_command_finished)
         self.onShown.append(self.run_command)
+        self.onClose.append(self.console.close)
+        self.onClose.append(self.cancel_auto_close)
+
+    def cancel_auto_close(self):
+        # Zamknięcie klawiszem przed upływem opóźnienia - callback wykonujemy raz, tutaj
+        if self.close_call:
+            self.close_call.cancel()
+            self.close_call = None
+            if self.callback: self.callback()
 
     def run_command(self):
-        self["console"].setText(f"> {self.command}\n\n")
+        self.console.set_text(f"> {self.command}\n\n")
         self.console_app.execute(self.command)
 
     def on_console_data(self, data):
-        if data: self["console"].setText(self["console"].getText() + data.decode("utf-8", "ignore"))
+        self.console.append_data(data)
 
     def on_command_finished(self, result):
-        self["console"].setText(self["console"].getText() + "\n\nPolecenie zakończone. Zamykanie okna...")
-        self.timer = eTimer()
-        try:
-            self.timer_conn = self.timer.timeout.connect(self.finish_and_close)
-        except:
-            self.timer.callback.append(self.finish_and_close)
-        self.timer.start(2000, True)
+        self.console.append("\n\nPolecenie zakończone. Zamykanie okna...")
+        self.console.flush()
+        self.close_call = tasks.dispatcher.post_later(2000, self.finish_and_close)
 
     def finish_and_close(self):
-        self.timer.stop()
+        self.close_call = None
         if self.callback:
             self.callback()
         self.close()
 
+class QuickSearch(object):
+    """Wyszukiwanie w trakcie pisania klawiszami numerycznymi pilota (wielokrotne naciśnięcie jak w SMS)."""
+    def __init__(self, on_change):
+        self.query = ""
+        self.on_change = on_change
+        self._last_key = None
+        self._pending = False
+        self.text_input = NumericalTextInput(nextFunc=self._commit_char)
+
+    def _commit_char(self):
+        self._pending = False
+
+    def key_number(self, number):
+        char = self.text_input.getKey(number).lower()
+        if self._pending and number == self._last_key:
+            self.query = self.query[:-1] + char
+        else:
+            self.query += char
+        self._pending, self._last_key = True, number
+        self.on_change(self.query)
+
+    def clear(self):
+        """Czyści zapytanie; zwraca False, jeśli nie było czego czyścić."""
+        if not self.query: return False
+        self.query, self._pending, self._last_key = "", False, None
+        self.on_change(self.query)
+        return True
+
+    @staticmethod
+    def number_actions(callback):
+        return dict((str(i), callback) for i in range(10))
+
 class AzmanFeedScreen(Screen):
+    MARKS = {feed.OpkgTransaction.INSTALL: "[+] ", feed.OpkgTransaction.REMOVE: "[-] "}
+
     def __init__(self, session, title="Azman Feed - Menedżer pakietów", filter_keywords=None):
         Screen.__init__(self, session)
         self.filter_keywords = filter_keywords
         self.setTitle(title)
+        self.screen_title = title
+        self.all_packages = []
+        self.base_ids = []
         self.packages = []
+        self.upgradable = []
+        self.search_index = None
+        self.quick_search = QuickSearch(self.on_search_changed)
+        self.transaction = feed.OpkgTransaction()
         self.worker = None
         self["title"] = StaticText(title)
         self["description"] = Label("Wczytywanie listy pakietów...")
         self["key_green"] = StaticText("Zainstaluj")
         self["key_red"] = StaticText("Odinstaluj")
         self["key_yellow"] = StaticText("Odśwież")
+        self["key_blue"] = StaticText("")
         self["list"] = MenuList([])
-        self["actions"] = ActionMap(["OkCancelActions", "ColorActions"], {"ok": self.handle_action, "cancel": self.close, "green": self.install_package, "red": self.remove_package, "yellow": self.refresh_list}, -1)
+        self["actions"] = ActionMap(["OkCancelActions", "ColorActions", "MenuActions"], {"ok": self.toggle_mark, "cancel": self.keyCancel, "green": self.install_package, "red": self.remove_package, "yellow": self.refresh_list, "blue": self.upgrade_all, "menu": self.open_cache_menu}, -1)
+        self["search_actions"] = NumberActionMap(["NumberActions"], QuickSearch.number_actions(self.quick_search.key_number), -1)
         self["list"].onSelectionChanged.append(self.on_selection_changed)
         self.onLayoutFinish.append(self.refresh_list)
         self.onClose.append(self.__onClose)
@@ -70,36 +219,68 @@ class AzmanFeedScreen(Screen):
     def __onClose(self):
         if self.worker and self.worker.is_alive(): self.worker.cancel()
 
+    def keyCancel(self):
+        if not self.quick_search.clear(): self.close()
+
     def refresh_list(self):
         self["description"].setText("Aktualizowanie listy pakietów...")
         self["list"].setList([])
+        self.transaction.clear()
         self.worker = PackageListWorker(callback_finished=self._on_package_list_ready)
         self.worker.start()
 
-    def _on_package_list_ready(self, error_message, packages):
+    def _on_package_list_ready(self, error_message, packages, upgradable, search_index):
         self.worker = None
         if error_message:
             self.session.open(MessageBox, error_message, type=MessageBox.TYPE_ERROR)
             self["description"].setText(error_message)
             return
+        self.all_packages = packages
+        self.search_index = search_index
         if self.filter_keywords:
-            filtered_packages = []
-            for pkg in packages:
-                pkg_name_lower = pkg.get('name', '').lower()
-                if any(keyword.lower() in pkg_name_lower for keyword in self.filter_keywords):
-                    filtered_packages.append(pkg)
-            self.packages = sorted(filtered_packages, key=lambda p: p['name'])
+            matched = set()
+            for keyword in self.filter_keywords:
+                matched.update(search_index.search(keyword, fields=(0,)))
+            self.base_ids = sorted(matched)
         else:
-            self.packages = sorted(packages, key=lambda p: p['name'])
+            self.base_ids = list(range(len(packages)))
+        visible_names = set(packages[i]['name'] for i in self.base_ids)
+        self.upgradable = [name for name in upgradable if name in visible_names]
+        self.apply_search()
+
+    def on_search_changed(self, query):
+        self["title"].setText(f"Szukaj: {query}" if query else self.screen_title)
+        self.apply_search()
+
+    def apply_search(self):
+        if self.search_index is None: return
+        if self.quick_search.query:
+            found = set(self.search_index.search(self.quick_search.query))
+            self.packages = [self.all_packages[i] for i in self.base_ids if i in found]
+        else:
+            self.packages = [self.all_packages[i] for i in self.base_ids]
+        self.build_list()
+
+    def build_list(self):
+        self["key_blue"].setText(f"Aktualizuj wszystkie ({len(self.upgradable)})" if self.upgradable else "")
+        self["key_green"].setText(f"Wykonaj ({len(self.transaction)})" if self.transaction else "Zainstaluj")
         if not self.packages:
             msg = "Nie znaleziono żadnych pasujących pakietów." if self.filter_keywords else "Brak dostępnych pakietów."
             self["description"].setText(msg)
             self["list"].setList([])
         else:
-            menu_list = [(f"{p['name']} ({p['version']}) - [{p['status']}]", p) for p in self.packages]
+            index = self["list"].getSelectedIndex()
+            menu_list = [(self._format_entry(p), p) for p in self.packages]
             self["list"].setList(menu_list)
+            self["list"].moveToIndex(min(index, len(menu_list) - 1))
         self.on_selection_changed()
 
+    def _format_entry(self, p):
+        mark = self.MARKS.get(self.transaction.get(p['name']), "")
+        if p['status'] == feed.STATUS_UPGRADABLE:
+            return f"{mark}{p['name']} ({p['installed_version']} -> {p['version']}) - [{p['status']}]"
+        return f"{mark}{p['name']} ({p['version']}) - [{p['status']}]"
+
     def on_selection_changed(self):
         current = self["list"].getCurrent()
         if current:
@@ -108,27 +289,121 @@ class AzmanFeedScreen(Screen):
             msg = "Nie znaleziono żadnych pasujących pakietów." if self.filter_keywords else "Brak dostępnych pakietów."
             self["description"].setText(msg)
 
-    def handle_action(self):
+    def toggle_mark(self):
         current = self["list"].getCurrent()
         if not current: return
-        self.install_package() if current[1]['status'] != 'Zainstalowany' else self.remove_package()
+        pkg = current[1]
+        action = feed.OpkgTransaction.REMOVE if pkg['status'] == feed.STATUS_INSTALLED else feed.OpkgTransaction.INSTALL
+        self.transaction.toggle(pkg['name'], action)
+        self.build_list()
+
+    def install_package(self):
+        if self.transaction:
+            self._run_transaction()
+        else:
+            self._run_opkg_command("install")
 
-    def install_package(self): self._run_opkg_command("install")
     def remove_package(self): self._run_opkg_command("remove")
 
     def _run_opkg_command(self, action):
         current = self["list"].getCurrent()
         if not current: return
         pkg = current[1]
-        if action == "install" and pkg['status'] == 'Zainstalowany':
+        if action == "install" and pkg['status'] == feed.STATUS_INSTALLED:
             self.session.open(MessageBox, "Ten pakiet jest już zainstalowany.", type=MessageBox.TYPE_INFO)
             return
-        if action == "remove" and pkg['status'] != 'Zainstalowany':
+        if action == "remove" and pkg['status'] == feed.STATUS_AVAILABLE:
             self.session.open(MessageBox, "Ten pakiet nie jest zainstalowany.", type=MessageBox.TYPE_INFO)
             return
-        command = f"opkg {action} {pkg['name']}"
-        title = f"{'Instalowanie' if action == 'install' else 'Odinstalowywanie'}: {pkg['name']}"
-        self.session.openWithCallback(self.refresh_list, OpkgCommandScreen, command=command, title=title)
+        self.transaction.clear()
+        self.transaction.set(pkg['name'], action)
+        self._run_transaction(f"{'Instalowanie' if action == 'install' else 'Odinstalowywanie'}: {pkg['name']}")
+
+    def _run_transaction(self, title=None):
+        if not self.transaction: return
+        self.transaction_title = title or f"Wykonywanie operacji na pakietach ({len(self.transaction)})"
+        installs = set(self.transaction.names(feed.OpkgTransaction.INSTALL))
+        to_cache = [p for p in self.packages if p['name'] in installs]
+        if not to_cache or feed.get_ipk_cache() is None:
+            self._on_ipk_cache_ready(None, {})
+            return
+        self.worker = IpkCacheWorker(to_cache, callback_progress=self._on_ipk_cache_progress, callback_finished=self._on_ipk_cache_ready)
+        self.worker.start()
+
+    def _on_ipk_cache_progress(self, current, total, text):
+        self["description"].setText(f"{text} ({current + 1}/{total})")
+
+    def _on_ipk_cache_ready(self, error_message, local_files):
+        self.worker = None
+        if error_message:
+            self["description"].setText(error_message)
+            return
+        command = self.transaction.build_command(local_files)
+        self.session.openWithCallback(self._on_transaction_finished, OpkgCommandScreen, command=command, title=self.transaction_title)
+
+    def _on_transaction_finished(self, *args):
+        self.transaction.clear()
+        self["description"].setText("Sprawdzanie stanu pakietów...")
+        self.worker = InstalledPackagesWorker(callback_finished=self._on_installed_packages_ready)
+        self.worker.start()
+
+    def _on_installed_packages_ready(self, error_message, installed):
+        self.worker = None
+        if error_message:
+            self.refresh_list()
+            return
+        # Aktualizacja statusów na miejscu - bez ponownego pobierania i parsowania feedu
+        self.upgradable = []
+        for i in self.base_ids:
+            p = self.all_packages[i]
+            p['installed_version'] = installed.get(p['name'])
+            p['status'] = feed.package_status(p['version'], p['installed_version'])
+            if p['status'] == feed.STATUS_UPGRADABLE: self.upgradable.append(p['name'])
+        self.build_list()
+
+    def open_cache_menu(self):
+        cache = feed.get_ipk_cache()
+        if cache is None:
+            self.session.open(MessageBox, f"Cache pakietów jest wyłączony - pod ścieżką {config.plugins.AzmanPanel.ipk_cache_path.value} nie jest zamontowany dysk HDD/USB (albo limit wynosi 0 MB).", type=MessageBox.TYPE_INFO)
+            return
+        count, size = cache.stats()
+        choices = []
+        current = self["list"].getCurrent()
+        if current:
+            pkg = current[1]
+            for version, path in cache.versions(pkg['name']):
+                if version != pkg.get('installed_version'):
+                    choices.append((f"Przywróć z cache: {pkg['name']} {version}", ("restore", path)))
+        choices.append((f"Przytnij cache do limitu ({config.plugins.AzmanPanel.ipk_cache_max_mb.value} MB)", ("prune", None)))
+        choices.append(("Wyczyść cache pakietów", ("clear", None)))
+        title = f"Cache pakietów: {count} plików, {size / (1024 * 1024):.1f} MB\n{cache.cache_dir}"
+        self.session.openWithCallback(self._on_cache_menu_choice, ChoiceBox, title=title, list=choices)
+
+    def _on_cache_menu_choice(self, choice):
+        if not choice: return
+        action, path = choice[1]
+        cache = feed.get_ipk_cache()
+        if action == "restore":
+            command = f"opkg install --force-downgrade --force-reinstall {path}"
+            self.session.openWithCallback(self._on_transaction_finished, OpkgCommandScreen, command=command, title=f"Przywracanie: {os.path.basename(path)}")
+            return
+        if cache is None: return
+        removed = cache.prune(0 if action == "clear" else None)
+        self.session.open(MessageBox, f"Usunięto z cache {removed} plików.", type=MessageBox.TYPE_INFO)
+
+    def upgrade_all(self):
+        if not self.upgradable:
+            self.session.open(MessageBox, "Wszystkie zainstalowane pakiety są aktualne.", type=MessageBox.TYPE_INFO)
+            return
+        message = f"Dostępne aktualizacje ({len(self.upgradable)}):\n\n" + "\n".join(self.upgradable) + "\n\nCzy zaktualizować wszystkie?"
+        self.session.openWithCallback(self._confirm_upgrade_all, MessageBox, message, MessageBox.TYPE_YESNO, default=True)
+
+    def _confirm_upgrade_all(self, confirmed):
+        if not confirmed: return
+        self.transaction.clear()
+        for name in self.upgradable:
+            self.transaction.set(name, feed.OpkgTransaction.INSTALL)
+        self._run_transaction("Aktualizowanie pakietów")
 
 class DownloadProgressScreen(Screen):
     def __init__(self, session, title="", parent_worker=None):
@@ -148,6 +423,15 @@ class DownloadProgressScreen(Screen):
             self["progress"].setValue(percent)
             self["progresstext"].setText(f"{percent}%")
 
+class StreamProbeReportScreen(Screen):
+    def __init__(self, session, report):
+        Screen.__init__(self, session)
+        self.setTitle("Raport strumieni IPTV")
+        self["console"] = ScrollLabel(report.summary() + f"\n\nPełny raport: {constants.PROBE_REPORT_PATH}\n\n" + "\n".join(report.lines()))
+        self["actions"] = ActionMap(
+            ["OkCancelActions", "DirectionActions"],
+            {"ok": self.close, "cancel": self.close, "up": self["console"].pageUp, "down": self["console"].pageDown}, -1)
+
 class PiconPathSelectionScreen(Screen):
     def __init__(self, session):
         Screen.__init__(self, session)
@@ -178,7 +462,11 @@ class AzmanSelectListScreen(Screen):
     def __init__(self, session, title, item_list, on_save_callback=None):
         Screen.__init__(self, session)
         self.setTitle(title)
+        self.screen_title = title
         self.item_list = item_list
+        self.visible_items = item_list
+        self.search_index = SearchIndex([(item[1],) for item in item_list])
+        self.quick_search = QuickSearch(self.on_search_changed)
         self.selected_items = []
         self.on_save_callback = on_save_callback
         self["title"] = StaticText(title)
@@ -186,9 +474,16 @@ class AzmanSelectListScreen(Screen):
         self["key_yellow"] = StaticText("Zaznacz/Odznacz wszystko")
         self["list"] = MenuList([])
         self["actions"] = ActionMap(["OkCancelActions", "ColorActions"], {"cancel": self.keyCancel, "ok": self.toggle_selection, "green": self.save, "yellow": self.toggle_all}, -1)
+        self["search_actions"] = NumberActionMap(["NumberActions"], QuickSearch.number_actions(self.quick_search.key_number), -1)
         self.onLayoutFinish.append(self.build_list)
+    def on_search_changed(self, query):
+        self["title"].setText(f"Szukaj: {query}" if query else self.screen_title)
+        self.visible_items = [self.item_list[i] for i in self.search_index.search(query)]
+        self.build_list()
     def build_list(self):
-        self["list"].setList([(f"[{'x' if item[0] in self.selected_items else ' '}] {item[1]}", item[0]) for item in self.item_list])
+        index = self["list"].getSelectedIndex()
+        self["list"].setList([(f"[{'x' if item[0] in self.selected_items else ' '}] {item[1]}", item[0]) for item in self.visible_items])
+        if self.visible_items: self["list"].moveToIndex(min(index, len(self.visible_items) - 1))
     def toggle_selection(self):
         current = self["list"].getCurrent()
         if not current: return
@@ -207,11 +502,36 @@ class AzmanSelectListScreen(Screen):
         else:
             self.close(self.selected_items)
     def keyCancel(self):
+        if self.quick_search.clear(): return
         self.close([])
 
 # Ścieżka do skryptu, który będziemy uruchamiać
 YT_RUNNER_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "scripts", "yt_aktualizator.py")
 CRON_FILE = "/etc/cron/crontabs/root"
+YT_RESOLVER_SOCKET = "/tmp/azman_yt_resolver.sock"
+YT_EXIT_UNCHANGED = 3  # kod wyjścia skryptu, gdy bukiet się nie zmienił
+
+YT_RESOLVER_PING_TIMEOUT = 1.0
+
+def is_yt_resolver_running():
+    """Usługa odpowiada na ping (jak --status skryptu); samo gniazdo mogło zostać po zabitym procesie."""
+    if not os.path.exists(YT_RESOLVER_SOCKET): return False
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.settimeout(YT_RESOLVER_PING_TIMEOUT)
+        client.connect(YT_RESOLVER_SOCKET)
+        client.sendall(b'{"cmd": "ping"}\n')
+        return json.loads(client.makefile("rb").readline().decode("utf-8")).get("result") == "pong"
+    except (OSError, ValueError):
+        return False
+    finally:
+        client.close()
+
+def start_yt_resolver():
+    """Uruchamia rezydentną usługę YT jako osobny proces (sama kończy pracę, jeśli już działa)."""
+    subprocess.Popen(["python3", YT_RUNNER_SCRIPT_PATH, "--daemon"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+
+YT_RUNNER_HELP = "Witaj!\n\nNaciśnij ZIELONY, aby uruchomić skrypt i wygenerować bukiet.\nNaciśnij ŻÓŁTY, aby dodać/usunąć automatyczne odświeżanie.\nNaciśnij NIEBIESKI, aby włączyć/wyłączyć rezydentną usługę YT (szybszy start skryptu)."
 
 class YtRunnerScreen(Screen):
     def __init__(self, session):
@@ -219,22 +539,46 @@ class YtRunnerScreen(Screen):
         self.session = session
         self.setTitle("YT to m3u8 Generator")
         
-        self["console"] = ScrollLabel("Witaj!\n\nNaciśnij ZIELONY, aby uruchomić skrypt i wygenerować bukiet.\nNaciśnij ŻÓŁTY, aby dodać/usunąć automatyczne odświeżanie.")
+        self["console"] = ScrollLabel(YT_RUNNER_HELP)
         self["key_green"] = StaticText("Uruchom")
         self["key_yellow"] = StaticText("Dodaj/Usuń z CRON")
+        self["key_blue"] = StaticText("")
         self["actions"] = ActionMap(
             ["OkCancelActions", "ColorActions", "DirectionActions"],
             {
                 "cancel": self.close,
                 "green": self.run_script,
                 "yellow": self.toggle_cron_job,
-                "up": self["console"].pageUp,
-                "down": self["console"].pageDown
+                "blue": self.toggle_resolver_service,
+                "up": self.page_up,
+                "down": self.page_down
             }, -1
         )
+        self.console = ConsoleBuffer(self["console"], log_path=console_log_path())
+        self.console.set_text(YT_RUNNER_HELP)
         self.console_app = eConsoleAppContainer()
         self.console_app.dataAvail.append(self.on_console_data)
         self.console_app.appClosed.append(self.on_command_finished)
+        self.onClose.append(self.console.close)
+        self.update_service_label()
+        self.upgrade_cron_job()
+
+    def update_service_label(self):
+        self["key_blue"].setText("Zatrzymaj usługę" if is_yt_resolver_running() else "Uruchom usługę")
+
+    def toggle_resolver_service(self):
+        # Skrypt sam korzysta z usługi, gdy ta działa; w przeciwnym razie wykonuje się jednorazowo jak dotąd
+        running = is_yt_resolver_running()
+        config.plugins.AzmanPanel.yt_resolver_autostart.value = not running
+        config.plugins.AzmanPanel.yt_resolver_autostart.save()
+        if running:
+            subprocess.Popen(["python3", YT_RUNNER_SCRIPT_PATH, "--stop"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.appendText("\n-> Zatrzymuję usługę YT.\n")
+            self["key_blue"].setText("Uruchom usługę")
+        else:
+            start_yt_resolver()
+            self.appendText("\n-> Uruchamiam usługę YT (ładowanie yt_dlp w tle, uruchamiana też przy starcie GUI).\n")
+            self["key_blue"].setText("Zatrzymaj usługę")
 
     def run_script(self):
         if not (os.path.exists(YT_RUNNER_SCRIPT_PATH) and os.access(YT_RUNNER_SCRIPT_PATH, os.X_OK)):
@@ -245,54 +589,80 @@ class YtRunnerScreen(Screen):
                 return
 
         command = f"python3 {YT_RUNNER_SCRIPT_PATH}"
-        self["console"].setText(f"> Uruchamiam: {command}\n\n")
+        self.console.set_text(f"> Uruchamiam: {command}\n\n")
         self.console_app.execute(command)
 
     def on_console_data(self, data):
-        if data:
-            current_text = self["console"].getText()
-            new_text = current_text + data.decode("utf-8", "ignore")
-            self["console"].setText(new_text)
+        self.console.append_data(data)
 
     def on_command_finished(self, result):
         self.appendText("\n--- SKRYPT ZAKOŃCZYŁ PRACĘ ---\n")
-        try:
-            # --- NOWA, LEPSZA METODA PRZEŁADOWANIA ---
-            self.appendText("-> Przeładowuję listę kanałów i bukietów...\n")
-            eDVBDB.getInstance().reloadBouquets()
-            eDVBDB.getInstance().reloadServicelist()
-            self.appendText("-> Przeładowano pomyślnie.\n\nMożesz teraz zamknąć to okno.")
+        if result == YT_EXIT_UNCHANGED:
+            self.appendText("-> Bukiet bez zmian, lista kanałów nie wymaga przeładowania.\n\nMożesz teraz zamknąć to okno.")
+            self.session.open(MessageBox, "Skrypt zakończył pracę. Bukiet nie zmienił się.", type=MessageBox.TYPE_INFO)
+            return
+        if result:
+            self.appendText(f"-> Skrypt zakończył się błędem (kod {result}), bukiet nie został zmieniony.\n\nMożesz teraz zamknąć to okno.")
+            self.session.open(MessageBox, "Skrypt zakończył pracę z błędem. Szczegóły w oknie konsoli.", type=MessageBox.TYPE_ERROR)
+            return
+        self.appendText("-> Przeładowuję bukiety...\n")
+        # Skrypt zmienia wyłącznie swój bukiet - lamedb nie wymaga przeładowania
+        servicelist.reload_service.request(servicelist.BOUQUETS, callback=self.on_reload_finished)
+
+    def on_reload_finished(self, reload_result):
+        if reload_result.ok:
+            self.appendText(f"-> Przeładowano pomyślnie ({reload_result.seconds:.1f} s).\n\nMożesz teraz zamknąć to okno.")
             message = "Skrypt zakończył pracę, a lista kanałów została odświeżona."
-        except Exception as e:
-            # Ta sekcja błędu teraz praktycznie nie powinna wystąpić
-            error_reason = str(e)
-            self.appendText(f"-> Błąd krytyczny podczas przeładowania: {error_reason}\n")
-            message = f"Skrypt zakończył pracę, ale wystąpił błąd podczas odświeżania listy kanałów.\n\nPowód: {error_reason}\n\nZrestartuj GUI ręcznie, aby zobaczyć zmiany."
-            
+        else:
+            self.appendText(f"-> Błąd krytyczny podczas przeładowania: {reload_result.error}\n")
+            message = f"Skrypt zakończył pracę, ale wystąpił błąd podczas odświeżania listy kanałów.\n\nPowód: {reload_result.error}\n\nZrestartuj GUI ręcznie, aby zobaczyć zmiany."
         self.session.open(MessageBox, message, type=MessageBox.TYPE_INFO)
 
+    def page_up(self):
+        self.console.page_up()
+
+    def page_down(self):
+        self.console.page_down()
+
     def appendText(self, text):
-        current_text = self["console"].getText()
-        self["console"].setText(current_text + text)
+        self.console.append(text)
         
-    def get_cron_command(self):
-        return f"30 4 * * * {YT_RUNNER_SCRIPT_PATH}"
+    def get_cron_commands(self):
+        # Pełne skanowanie raz na dobę + co godzinę lekkie odświeżenie wygasających linków i nowych transmisji;
+        # --reload, bo enigma nie zobaczy nowych linków bez przeładowania bukietów
+        return [f"30 4 * * * {YT_RUNNER_SCRIPT_PATH} --reload", f"15 * * * * {YT_RUNNER_SCRIPT_PATH} --refresh --reload"]
+
+    def upgrade_cron_job(self):
+        # Wpisy dodane przez starsze wersje (bez --reload) zastępujemy bieżącymi
+        try:
+            with open(CRON_FILE, 'r') as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        ours = [line.strip() for line in lines if YT_RUNNER_SCRIPT_PATH in line]
+        if not ours or ours == self.get_cron_commands(): return
+        new_lines = [line for line in lines if YT_RUNNER_SCRIPT_PATH not in line] + [f"{command}\n" for command in self.get_cron_commands()]
+        try:
+            with open(CRON_FILE, 'w') as f:
+                f.writelines(new_lines)
+            os.system("/etc/init.d/crond.sh restart")
+        except OSError as e:
+            utils.log_error(e, "YtRunnerScreen.upgrade_cron_job")
 
     def toggle_cron_job(self):
-        cron_command = self.get_cron_command()
         if not os.path.exists(CRON_FILE):
             with open(CRON_FILE, 'w') as f:
                 f.write('')
         with open(CRON_FILE, 'r') as f:
             lines = f.readlines()
-        job_exists = any(cron_command in line for line in lines)
+        job_exists = any(YT_RUNNER_SCRIPT_PATH in line for line in lines)
         if job_exists:
-            new_lines = [line for line in lines if cron_command not in line]
+            new_lines = [line for line in lines if YT_RUNNER_SCRIPT_PATH not in line]
             message = "Zadanie CRON zostało pomyślnie usunięte."
         else:
             new_lines = lines
-            new_lines.append(f"{cron_command}\n")
-            message = "Zadanie CRON zostało dodane.\n\nBukiet będzie automatycznie odświeżany codziennie o 04:30."
+            new_lines.extend(f"{command}\n" for command in self.get_cron_commands())
+            message = "Zadanie CRON zostało dodane.\n\nBukiet będzie w pełni odświeżany codziennie o 04:30, a wygasające linki - co godzinę."
         try:
             with open(CRON_FILE, 'w') as f:
                 f.writelines(new_lines)
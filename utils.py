@@ -1,12 +1,16 @@
 # /usr/lib/enigma2/python/Plugins/Extensions/AzmanPanel/utils.py
 
 import os
+import json
+import zlib
+import hashlib
 import zipfile
 import traceback
 import datetime
 import shutil  # <-- IMPORT PRZENIESIONY TUTAJ
 
 LOG_FILE = "/tmp/azman_panel.log"
+READ_CHUNK_SIZE = 64 * 1024
 
 def log_error(exception, context_info="Unknown"):
     try:
@@ -22,10 +26,39 @@ def log_error(exception, context_info="Unknown"):
     except Exception as log_e:
         print(f"[AzmanPanel] BŁĄD KRYTYCZNY: Nie można zapisać do pliku logu {LOG_FILE}. Błąd: {log_e}")
 
-def safe_extract_zip_member(zip_ref, member, target_dir):
+def load_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def save_json_atomic(path, data):
+    """Zapisuje JSON przez plik tymczasowy, aby przerwany zapis nie zostawił uszkodzonego pliku."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def file_hash(path, algorithm):
+    """Skrót pliku czytanego blokami: algorytm z hashlib (wynik szesnastkowy) albo "crc32" (liczba jak w ZIP)."""
+    hasher = None if algorithm == "crc32" else hashlib.new(algorithm)
+    crc = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_CHUNK_SIZE), b""):
+            if hasher: hasher.update(block)
+            else: crc = zlib.crc32(block, crc)
+    return hasher.hexdigest() if hasher else crc & 0xFFFFFFFF
+
+def safe_zip_target_path(member, target_dir):
     target_path = os.path.join(target_dir, member.filename)
     if not os.path.realpath(target_path).startswith(os.path.realpath(target_dir)):
         raise zipfile.BadZipFile(f"Wykryto próbę ataku ścieżką (path traversal): {member.filename}")
+    return target_path
+
+def safe_extract_zip_member(zip_ref, member, target_dir):
+    target_path = safe_zip_target_path(member, target_dir)
     if not member.is_dir():
         parent_dir = os.path.dirname(target_path)
         os.makedirs(parent_dir, exist_ok=True)
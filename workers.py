@@ -1,62 +1,92 @@
 import threading
+import queue
 import urllib.request
 import urllib.parse
 import subprocess
-import gzip
 import re
+import time
 import os
-import tempfile
 import zipfile
+import shutil
+import concurrent.futures
 from Tools.BoundFunction import boundFunction
-from enigma import eTimer
-from . import constants, utils
+from . import constants, utils, feed, picons, net, throttle, bouquets, servicelist, prober, tasks
+from .search import SearchIndex
 
-class BaseWorker(threading.Thread):
-    def __init__(self, callback_finished):
-        threading.Thread.__init__(self)
-        self._is_cancelled = False
+class BaseWorker(object):
+    """
+    Zadanie w tle wykonywane we wspólnej puli wątków (tasks.executor). Interfejs jak dotąd: start(),
+    cancel(), is_alive(). Wyniki i postęp trafiają do wątku głównego przez tasks.dispatcher, a po
+    anulowaniu callbacki nie są już wywoływane. Podklasy implementują run().
+    """
+    RESULT_SLOTS = 2  # liczba argumentów callback_finished (pierwszy to komunikat błędu)
+    FAILURE_MESSAGE = "Wystąpił nieoczekiwany błąd. Szczegóły w logu."
+
+    def __init__(self, callback_finished, callback_progress=None):
+        self.token = tasks.CancellationToken()
         self.callback_finished = callback_finished
-        self.timer = eTimer()
-        self.timer.callback.append(self._safe_callback)
-        self._callback_args = ()
+        self.callback_progress = callback_progress
+        self.future = None
+        self._finish_posted = False
+
+    @property
+    def _is_cancelled(self):
+        return self.token.cancelled
+
+    def start(self):
+        self.future = tasks.executor.submit(self.run)
+        self.future.add_done_callback(self._on_done)
+
+    def _on_done(self, future):
+        # Wyjątek, który uciekł z run(), nie może zostawić ekranu postępu bez odpowiedzi
+        if future.cancelled() or future.exception() is None: return
+        utils.log_error(future.exception(), self.__class__.__name__)
+        if not self._finish_posted:
+            self._safe_call_main_thread(self.FAILURE_MESSAGE, *([None] * (self.RESULT_SLOTS - 1)))
 
     def cancel(self):
-        self._is_cancelled = True
+        self.token.cancel()
+        if self.future: self.future.cancel()  # zadanie jeszcze czekające w kolejce puli nie wystartuje
+
+    def is_alive(self):
+        return self.future is not None and not self.future.done()
+
+    def join(self, timeout=None):
+        if self.future:
+            concurrent.futures.wait([self.future], timeout)
 
     def _safe_call_main_thread(self, *args):
-        self._callback_args = args
-        self.timer.start(0, True)
+        self._finish_posted = True
+        tasks.dispatcher.post(self._deliver, self.callback_finished, args)
+
+    def _safe_call_progress(self, *args):
+        tasks.dispatcher.post_progress(self, self._deliver, self.callback_progress, args)
 
-    def _safe_callback(self):
-        self.timer.stop()
-        if not self._is_cancelled and self.callback_finished:
-            self.callback_finished(*self._callback_args)
+    def _deliver(self, callback, args):
+        if not self._is_cancelled and callback:
+            callback(*args)
 
     def _internal_reporthook(self, count, block_size, total_size):
         if self._is_cancelled:
             raise InterruptedError("Download cancelled by user")
+        throttle.io_budget.network_bytes(block_size)
 
 # --- Workery dla Azman OPKG Feed ---
 # ... (bez zmian) ...
 class PackageListWorker(BaseWorker):
+    RESULT_SLOTS = 4
     def __init__(self, callback_finished):
         super(PackageListWorker, self).__init__(callback_finished)
         self.error_message = None
         self.packages = []
-    def _parse_packages_file(self, content):
-        packages = []
-        current_package = {}
-        for line in content.split('\n'):
-            if not line:
-                if 'Package' in current_package: packages.append(current_package)
-                current_package = {}
-                continue
-            if ': ' in line:
-                key, value = line.split(': ', 1)
-                current_package[key] = value
-        if 'Package' in current_package: packages.append(current_package)
-        return packages
+        self.upgradable = []
+        self.search_index = None
     def _get_installed_packages(self):
+        try:
+            installed = feed.get_installed_packages()
+            if installed is not None: return installed
+        except Exception as e:
+            utils.log_error(e, "opkg status")
         installed = {}
         try:
             process = subprocess.Popen(["opkg", "list-installed"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -74,21 +104,68 @@ class PackageListWorker(BaseWorker):
         return installed
     def run(self):
         try:
-            packages_gz_url = f"{constants.FEED_PACKAGES_BASE_URL}/all/Packages.gz"
-            with urllib.request.urlopen(packages_gz_url, timeout=20) as response:
-                packages_content = gzip.decompress(response.read()).decode('utf-8')
-            available_packages = self._parse_packages_file(packages_content)
+            available_packages = feed.load_feed_index()
             installed_packages = self._get_installed_packages()
             if self.error_message: raise Exception(self.error_message)
             for pkg in available_packages:
-                pkg_name = pkg.get('Package')
-                if not pkg_name: continue
-                self.packages.append({'name': pkg_name, 'version': pkg.get('Version', 'N/A'), 'description': pkg.get('Description', 'Brak opisu.'), 'status': 'Zainstalowany' if pkg_name in installed_packages else 'Dostępny'})
+                if not pkg.name: continue
+                installed_version = installed_packages.get(pkg.name)
+                status = feed.package_status(pkg.version, installed_version)
+                if status == feed.STATUS_UPGRADABLE: self.upgradable.append(pkg.name)
+                self.packages.append({'name': pkg.name, 'version': pkg.version or 'N/A', 'installed_version': installed_version, 'description': pkg.description or 'Brak opisu.', 'size': pkg.size, 'depends': pkg.depends, 'filename': pkg.filename, 'checksum': pkg.checksum, 'status': status})
+            self.packages.sort(key=lambda p: p['name'])
+            self.search_index = SearchIndex([(p['name'], p['description']) for p in self.packages])
         except Exception as e:
             utils.log_error(e, self.__class__.__name__)
             self.error_message = "Nie można pobrać listy pakietów. Sprawdź połączenie z internetem."
         finally:
-            self._safe_call_main_thread(self.error_message, self.packages)
+            self._safe_call_main_thread(self.error_message, self.packages, self.upgradable, self.search_index)
+
+class InstalledPackagesWorker(PackageListWorker):
+    """Odczytuje tylko stan zainstalowanych pakietów - do aktualizacji listy po transakcji bez pobierania feedu."""
+    RESULT_SLOTS = 2
+    def __init__(self, callback_finished):
+        super(InstalledPackagesWorker, self).__init__(callback_finished)
+        self.installed = {}
+    def run(self):
+        try:
+            self.installed = self._get_installed_packages()
+        except Exception as e:
+            utils.log_error(e, self.__class__.__name__)
+            self.error_message = "Błąd sprawdzania zainstalowanych pakietów."
+        finally:
+            self._safe_call_main_thread(self.error_message, self.installed)
+
+class IpkCacheWorker(BaseWorker):
+    """Pobiera pakiety do lokalnego cache .ipk (lub bierze je z cache) przed zbiorczą instalacją."""
+    def __init__(self, packages, callback_progress, callback_finished):
+        super(IpkCacheWorker, self).__init__(callback_finished, callback_progress)
+        self.packages = packages
+        self.local_files = {}
+        self.error_message = None
+    def run(self):
+        throttle.lower_io_priority()
+        try:
+            cache = feed.get_ipk_cache()
+            if cache is None: return  # cache wyłączony - opkg pobierze pakiety samodzielnie
+            total = len(self.packages)
+            for i, pkg in enumerate(self.packages):
+                if self._is_cancelled: raise InterruptedError("Download cancelled by user")
+                if not pkg.get('filename'): continue
+                self._safe_call_progress(i, total, f"Pobieranie do cache: {pkg['name']}")
+                try:
+                    self.local_files[pkg['name']] = cache.fetch(pkg['name'], pkg['version'], pkg.get('checksum', ''), pkg['filename'], lambda: self._is_cancelled, throttle.io_budget.network_bytes)
+                except InterruptedError:
+                    raise
+                except Exception as e:
+                    # Brak pliku w cache nie blokuje instalacji - opkg pobierze pakiet samodzielnie
+                    utils.log_error(e, f"{self.__class__.__name__}: {pkg['name']}")
+        except InterruptedError:
+            self.error_message = "Pobieranie anulowane przez użytkownika."
+        except Exception as e:
+            utils.log_error(e, self.__class__.__name__)
+        finally:
+            self._safe_call_main_thread(self.error_message, self.local_files)
 
 # --- Workery dla Picon ---
 # ... (bez zmian) ...
@@ -110,41 +187,123 @@ class PiconZipListWorker(BaseWorker):
         finally:
             self._safe_call_main_thread(self.error_message, self.picon_zip_filenames)
 class PiconInstallationWorker(BaseWorker):
-    def __init__(self, selected_zips, target_dir, callback_progress, callback_finished):
-        super(PiconInstallationWorker, self).__init__(callback_finished)
+    """
+    Instalacja picon jako potok: kilka wątków pobiera paczki ZIP równolegle, a ten wątek
+    rozpakowuje kolejne gotowe paczki, podczas gdy następne wciąż się pobierają.
+    """
+    RESULT_SLOTS = 1
+    def __init__(self, selected_zips, target_dir, callback_progress, callback_finished, concurrency=None, delete_stale=False, only_owned=False, remote_ranges=False):
+        super(PiconInstallationWorker, self).__init__(callback_finished, callback_progress)
         self.selected_zips = selected_zips
         self.target_dir = target_dir
-        self.callback_progress = callback_progress
-        self.progress_timer = eTimer()
-        self.progress_timer.callback.append(self._safe_progress_callback)
-        self._progress_args = ()
-    def _safe_call_progress(self, *args):
-        self._progress_args = args
-        self.progress_timer.start(0, True)
-    def _safe_progress_callback(self):
-        self.progress_timer.stop()
-        if not self._is_cancelled and self.callback_progress:
-            self.callback_progress(*self._progress_args)
+        self.delete_stale = delete_stale
+        self.only_owned = only_owned
+        self.remote_ranges = remote_ranges
+        self.channel_index = None
+        self.extractor = None
+        self.range_files = []
+        self.concurrency = max(1, concurrency or constants.PICON_DOWNLOAD_CONCURRENCY)
+        self._stop_downloads = threading.Event()
+    def _should_stop(self):
+        return self._is_cancelled or self._stop_downloads.is_set()
+    def _download_zip(self, zip_filename, partial_dir):
+        temp_zip_path = os.path.join(partial_dir, zip_filename)
+        picon_zip_url = urllib.parse.urljoin(constants.PICONS_BASE_URL, zip_filename)
+        if self.channel_index is not None and self.remote_ranges:
+            # Tylko wybrane picony - czytamy katalog centralny i potrzebne pliki zakresami zamiast całego ZIP
+            try:
+                return net.HttpRangeFile(picon_zip_url, throttle=throttle.io_budget.network_bytes)
+            except Exception as e:
+                utils.log_error(e, f"{self.__class__.__name__}: HTTP Range {zip_filename}")
+        # Trwały katalog częściowych pobrań - po anulowaniu lub zerwaniu połączenia pobieranie jest wznawiane
+        if os.path.exists(temp_zip_path) and time.time() - os.path.getmtime(temp_zip_path) > 24 * 3600:
+            os.remove(temp_zip_path)  # kompletna paczka z dawnej, nieukończonej instalacji - mogła się zmienić na serwerze
+        if not os.path.exists(temp_zip_path):
+            net.download_resumable(picon_zip_url, temp_zip_path, is_cancelled=self._should_stop, throttle=throttle.io_budget.network_bytes)
+        picons.verify_zip(temp_zip_path)
+        return temp_zip_path
+    def _download_loop(self, jobs, ready, partial_dir):
+        throttle.lower_io_priority()
+        while not self._should_stop():
+            try:
+                zip_filename = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = (zip_filename, self._download_zip(zip_filename, partial_dir), None)
+            except Exception as e:
+                result = (zip_filename, None, e)
+            while not self._should_stop():
+                try:
+                    ready.put(result, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+    def _next_ready(self, ready):
+        while True:
+            if self._is_cancelled: raise InterruptedError("Installation cancelled")
+            try:
+                return ready.get(timeout=0.5)
+            except queue.Empty:
+                continue
+    def _extract_zip(self, zip_filename, source):
+        try:
+            with zipfile.ZipFile(source, 'r') as zip_ref:
+                self.extractor.extract_zip(zip_ref, zip_filename, lambda: self._is_cancelled)
+        finally:
+            if isinstance(source, str):
+                os.remove(source)
+            else:
+                self.range_files.append(source.bytes_fetched)
+                source.close()
+    def _install_all(self, partial_dir):
+        total_zips = len(self.selected_zips)
+        jobs = queue.Queue()
+        for zip_filename in self.selected_zips: jobs.put(zip_filename)
+        # Ograniczona kolejka gotowych paczek - pobieranie nie wyprzedza rozpakowywania o więcej niż N plików
+        ready = queue.Queue(maxsize=self.concurrency)
+        downloaders = []
+        for _ in range(min(self.concurrency, total_zips)):
+            thread = threading.Thread(target=self._download_loop, args=(jobs, ready, partial_dir))
+            thread.daemon = True
+            thread.start()
+            downloaders.append(thread)
+        try:
+            self._safe_call_progress(0, total_zips, f"Pobieranie {total_zips} paczek ({len(downloaders)} równolegle)...")
+            failed = []
+            for i in range(total_zips):
+                zip_filename, temp_zip_path, error = self._next_ready(ready)
+                display_filename = urllib.parse.unquote(zip_filename)
+                if error is not None:
+                    if isinstance(error, InterruptedError): raise error
+                    utils.log_error(error, f"{self.__class__.__name__}: {display_filename}")
+                    failed.append(display_filename)
+                    continue
+                self._safe_call_progress(i, total_zips, f"Rozpakowywanie: {display_filename}")
+                self._extract_zip(zip_filename, temp_zip_path)
+            return failed
+        finally:
+            self._stop_downloads.set()
+            for thread in downloaders: thread.join(5)
     def run(self):
+        throttle.lower_io_priority()
         final_message = ""
         try:
-            with tempfile.TemporaryDirectory() as temp_dir:
-                if not os.path.exists(self.target_dir):
-                    os.makedirs(self.target_dir)
-                total_zips = len(self.selected_zips)
-                for i, zip_filename in enumerate(self.selected_zips):
-                    if self._is_cancelled: break
-                    display_filename = urllib.parse.unquote(zip_filename)
-                    self._safe_call_progress(i, total_zips, f"Pobieranie: {display_filename}")
-                    temp_zip_path = os.path.join(temp_dir, zip_filename)
-                    picon_zip_url = urllib.parse.urljoin(constants.PICONS_BASE_URL, zip_filename)
-                    urllib.request.urlretrieve(picon_zip_url, temp_zip_path, reporthook=self._internal_reporthook)
-                    self._safe_call_progress(i, total_zips, f"Rozpakowywanie: {display_filename}")
-                    with zipfile.ZipFile(temp_zip_path, 'r') as zip_ref:
-                        for member in zip_ref.infolist():
-                            if self._is_cancelled: break
-                            utils.safe_extract_zip_member(zip_ref, member, self.target_dir)
-                final_message = f"Zainstalowano pomyślnie {len(self.selected_zips)} paczek." if not self._is_cancelled else "Instalacja anulowana."
+            partial_dir = os.path.join(self.target_dir, picons.PARTIAL_DIR_NAME)
+            os.makedirs(partial_dir, exist_ok=True)
+            if self.only_owned:
+                self._safe_call_progress(0, len(self.selected_zips), "Wczytywanie listy kanałów...")
+                self.channel_index = picons.ChannelIndex.build(constants.ENIGMA2_SETTINGS_DIR)
+                if not len(self.channel_index):
+                    # Pusta lista kanałów - lepiej zainstalować wszystko niż nic
+                    self.channel_index = None
+            self.extractor = picons.PiconExtractor(self.target_dir, delete_stale=self.delete_stale, channel_index=self.channel_index, throttle=throttle.io_budget.disk_bytes, write_buffer=throttle.WRITE_BUFFER_SIZE)
+            failed = self._install_all(partial_dir)
+            final_message = f"Zainstalowano pomyślnie {len(self.selected_zips) - len(failed)} paczek.\n{self.extractor.stats.summary()}"
+            if self.range_files:
+                final_message += f"\nPobrano zakresami HTTP: {sum(self.range_files) / (1024.0 * 1024.0):.1f} MB z {len(self.range_files)} paczek"
+            if failed:
+                final_message += "\n\nNie udało się pobrać (zostanie wznowione przy kolejnej próbie):\n" + "\n".join(failed)
         except InterruptedError:
             final_message = "Instalacja anulowana przez użytkownika."
         except Exception as e:
@@ -156,17 +315,32 @@ class PiconInstallationWorker(BaseWorker):
 # --- Workery dla Bukietów ---
 # POPRAWKA: Zmodyfikowano, aby przyjmować URL jako argument
 class IptvBouquetListWorker(BaseWorker):
-    def __init__(self, list_url, callback_finished):
+    RESULT_SLOTS = 3
+    def __init__(self, list_url, callback_finished, manifest_url=None):
         super(IptvBouquetListWorker, self).__init__(callback_finished)
         self.list_url = list_url
+        self.manifest_url = manifest_url
         self.error_message = None
         self.bouquet_filenames = []
+        self.manifest = {}
+
+    def _scrape_html(self):
+        with urllib.request.urlopen(self.list_url, timeout=10) as response:
+            html = response.read().decode('utf-8')
+        return re.findall(r'href="[^"]*?(userbouquet\.[^"]+\.tv)"', html)
         
     def run(self):
         try:
-            with urllib.request.urlopen(self.list_url, timeout=10) as response:
-                html = response.read().decode('utf-8')
-            found_files = re.findall(r'href="[^"]*?(userbouquet\.[^"]+\.tv)"', html)
+            found_files = []
+            if self.manifest_url:
+                # Kilka KB manifestu zamiast całej strony GitHuba; przy 304 katalog czytany jest z dysku
+                try:
+                    self.manifest = bouquets.load_bouquet_manifest(self.manifest_url)
+                    found_files = list(self.manifest)
+                except Exception as e:
+                    utils.log_error(e, f"{self.__class__.__name__}: manifest")
+            if not found_files:
+                found_files = self._scrape_html()
             self.bouquet_filenames = sorted(list(set(found_files)), key=lambda x: x.lower())
             if not self.bouquet_filenames:
                 self.error_message = "Nie znaleziono żadnych plików bukietów w repozytorium."
@@ -174,66 +348,117 @@ class IptvBouquetListWorker(BaseWorker):
             utils.log_error(e, self.__class__.__name__)
             self.error_message = "Błąd pobierania listy bukietów."
         finally:
-            self._safe_call_main_thread(self.error_message, self.bouquet_filenames)
+            self._safe_call_main_thread(self.error_message, self.bouquet_filenames, self.manifest)
 
 # POPRAWKA: Zmodyfikowano, aby przyjmować BASE_URL jako argument
 class IptvBouquetInstallWorker(BaseWorker):
-    def __init__(self, selected_bouquets, base_url, callback_progress, callback_finished):
-        super(IptvBouquetInstallWorker, self).__init__(callback_finished)
+    RESULT_SLOTS = 1
+    def __init__(self, selected_bouquets, base_url, callback_progress, callback_finished, manifest=None):
+        super(IptvBouquetInstallWorker, self).__init__(callback_finished, callback_progress)
         self.selected_bouquets = selected_bouquets
         self.base_url = base_url
-        self.callback_progress = callback_progress
-        self.progress_timer = eTimer()
-        self.progress_timer.callback.append(self._safe_progress_callback)
-        self._progress_args = ()
+        self.manifest = manifest or {}
+        self.to_download = list(selected_bouquets)
+
+    def _fetch_to_staging(self, pool, filename, staging_dir, abort):
+        data = pool.get(self.base_url + filename, is_cancelled=lambda: self._is_cancelled or abort.is_set(), throttle=throttle.io_budget.network_bytes)
+        with open(os.path.join(staging_dir, filename), "wb") as f:
+            f.write(data)
+        return filename
+
+    def _download_all(self, staging_dir):
+        total_bouquets = len(self.to_download)
+        pool = net.HttpConnectionPool(timeout=20)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=constants.BOUQUET_DOWNLOAD_CONCURRENCY)
+        abort = threading.Event()
+        futures = []
+        try:
+            futures = [executor.submit(self._fetch_to_staging, pool, filename, staging_dir, abort) for filename in self.to_download]
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                filename = future.result()  # pierwszy błąd przerywa instalację - nic nie trafia do /etc/enigma2
+                self._safe_call_progress(done, total_bouquets, f"Pobrano: {filename}")
+        finally:
+            abort.set()
+            for future in futures: future.cancel()
+            executor.shutdown(wait=True)
+            pool.close()
+
+    def _stage_bouquets_tv(self, bouquets_tv_path, staging_dir):
+        return bouquets.write_bouquets_tv(bouquets_tv_path, self.selected_bouquets, os.path.join(staging_dir, "bouquets.tv"))
+
+    def _filter_changed(self, target_dir, staging_dir):
+        # Porównanie strukturalne z zainstalowaną wersją - identyczne bukiety nie są nadpisywane
+        changed, added, removed, fresh = [], 0, 0, {}
+        for filename in self.to_download:
+            staged_path = os.path.join(staging_dir, filename)
+            new_bouquet = bouquets.Bouquet.load(staged_path)
+            fresh[filename] = new_bouquet
+            diff = bouquets.diff_installed(os.path.join(target_dir, filename), new_bouquet)
+            if diff.changed:
+                changed.append(filename)
+                added += diff.added
+                removed += diff.removed
+            else:
+                os.remove(staged_path)
+        return changed, added, removed, fresh
+
+    def _commit_staging(self, target_dir, staging_dir, changed, bouquets_tv_changed):
+        # Wszystkie pliki są już kompletne; każda podmiana to atomowy rename w obrębie jednego systemu plików.
+        # bouquets.tv na końcu, więc nigdy nie wskazuje na bukiet, którego jeszcze nie ma.
+        for filename in changed:
+            os.replace(os.path.join(staging_dir, filename), os.path.join(target_dir, filename))
+        if bouquets_tv_changed:
+            os.replace(os.path.join(staging_dir, "bouquets.tv"), os.path.join(target_dir, "bouquets.tv"))
+
+    def _duplicates_report(self, target_dir, fresh):
+        try:
+            duplicates = bouquets.find_duplicates(bouquets.load_installed(target_dir, fresh))
+        except Exception as e:
+            utils.log_error(e, "Bouquet duplicates")
+            return ""
+        if not duplicates: return ""
+        names = sorted(label for label, _ in duplicates.values())
+        report = f"\nKanały powtórzone w kilku bukietach: {len(duplicates)}"
+        report += "\n" + ", ".join(names[:5]) + (" ..." if len(names) > 5 else "")
+        return report
 
-    def _safe_call_progress(self, *args):
-        self._progress_args = args
-        self.progress_timer.start(0, True)
-    
-    def _safe_progress_callback(self):
-        self.progress_timer.stop()
-        if not self._is_cancelled and self.callback_progress:
-            self.callback_progress(*self._progress_args)
-            
     def run(self):
+        throttle.lower_io_priority()
         final_message = ""
-        target_dir = "/etc/enigma2"
+        target_dir = constants.ENIGMA2_SETTINGS_DIR
         bouquets_tv_path = os.path.join(target_dir, "bouquets.tv")
+        staging_dir = os.path.join(target_dir, constants.BOUQUET_STAGING_DIR_NAME)
         
         try:
             total_bouquets = len(self.selected_bouquets)
-            for i, filename in enumerate(self.selected_bouquets):
-                if self._is_cancelled: raise InterruptedError("Installation cancelled")
-                self._safe_call_progress(i, total_bouquets, f"Pobieranie: {filename}")
-                
-                download_url = self.base_url + filename
-                target_path = os.path.join(target_dir, filename)
-                urllib.request.urlretrieve(download_url, target_path, reporthook=self._internal_reporthook)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            os.makedirs(staging_dir)
+            # Bukiety identyczne z opisem w manifeście (sha256) nie są pobierane ponownie
+            self.to_download = [f for f in self.selected_bouquets if not bouquets.is_up_to_date(os.path.join(target_dir, f), self.manifest.get(f))]
+            skipped = total_bouquets - len(self.to_download)
+            self._safe_call_progress(0, total_bouquets, f"Pobieranie {len(self.to_download)} bukiet(ów)...")
+            self._download_all(staging_dir)
+            if self._is_cancelled: raise InterruptedError("Installation cancelled")
 
-            self._safe_call_progress(total_bouquets, total_bouquets, "Aktualizowanie bouquets.tv...")
-            
-            existing_lines = []
-            if os.path.exists(bouquets_tv_path):
-                with open(bouquets_tv_path, "r") as f:
-                    existing_lines = [line.strip() for line in f.readlines()]
-            
-            existing_bouquets_set = set(existing_lines)
-            
-            for filename in self.selected_bouquets:
-                bouquet_line = f'1:7:1:0:0:0:0:0:0:0:FROM BOUQUET "{filename}" ORDER BY bouquet'
-                if bouquet_line not in existing_bouquets_set:
-                    existing_lines.append(bouquet_line)
-            
-            with open(bouquets_tv_path, "w") as f:
-                f.write("\n".join(existing_lines) + "\n")
-            
+            self._safe_call_progress(total_bouquets, total_bouquets, "Porównywanie z zainstalowanymi bukietami...")
+            changed, added, removed, fresh = self._filter_changed(target_dir, staging_dir)
+            bouquets_tv_changed = self._stage_bouquets_tv(bouquets_tv_path, staging_dir)
+            self._commit_staging(target_dir, staging_dir, changed, bouquets_tv_changed)
+            duplicates_report = self._duplicates_report(target_dir, fresh)
+
+            if not changed and not bouquets_tv_changed:
+                # Nic się nie zmieniło - przeładowanie listy kanałów byłoby zbędnym przestojem GUI
+                final_message = f"Wybrane bukiety ({total_bouquets}) są aktualne.\nLista kanałów nie wymagała przeładowania." + duplicates_report
+                return
+
+            details = f"\nZmienione bukiety: {len(changed)} (kanały +{added} / -{removed}), bez zmian: {total_bouquets - len(changed)}"
+            if skipped: details += f"\nPominięto aktualne (bez pobierania): {skipped}"
             self._safe_call_progress(total_bouquets, total_bouquets, "Przeładowywanie listy kanałów...")
-            try:
-                urllib.request.urlopen("http://127.0.0.1/api/servicelistreload?mode=2", timeout=15).read()
-                final_message = f"Zainstalowano pomyślnie {total_bouquets} bukiet(ów).\nLista kanałów została przeładowana."
-            except Exception as reload_e:
-                utils.log_error(reload_e, "ServicelistReload")
+            # Zmieniły się tylko bukiety - lamedb zostaje nietknięta
+            result = servicelist.reload_service.request(servicelist.BOUQUETS).wait(30)
+            if result and result.ok:
+                final_message = f"Zainstalowano pomyślnie {total_bouquets} bukiet(ów).\nLista kanałów została przeładowana ({result.seconds:.1f} s)." + details + duplicates_report
+            else:
                 final_message = f"Zainstalowano {total_bouquets} bukiet(ów), ale wystąpił błąd podczas przeładowywania listy kanałów. Zrestartuj GUI ręcznie."
                 
         except InterruptedError:
@@ -242,9 +467,42 @@ class IptvBouquetInstallWorker(BaseWorker):
             utils.log_error(e, self.__class__.__name__)
             final_message = f"Wystąpił błąd podczas instalacji:\n{e}"
         finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
             self._safe_call_main_thread(final_message)
 
 
+class StreamProbeWorker(BaseWorker):
+    """Sprawdza strumienie z zainstalowanych bukietów; opcjonalnie zapisuje bukiet niedziałających kanałów."""
+    def __init__(self, callback_progress, callback_finished, write_dead_bouquet=False):
+        super(StreamProbeWorker, self).__init__(callback_finished, callback_progress)
+        self.write_dead_bouquet = write_dead_bouquet
+
+    def run(self):
+        error_message, report = None, None
+        try:
+            settings_dir = constants.ENIGMA2_SETTINGS_DIR
+            channels = prober.collect_channels(bouquets.load_installed(settings_dir))
+            if not channels:
+                error_message = "W zainstalowanych bukietach nie ma kanałów strumieniowych."
+                return
+            self._safe_call_progress(0, len(channels), f"Sprawdzanie {len(channels)} kanałów...")
+            results = prober.StreamProber().probe(
+                [channel[3] for channel in channels],
+                progress=lambda done, total: self._safe_call_progress(done, total, f"Sprawdzono {done} z {total} adresów"),
+                is_cancelled=lambda: self._is_cancelled)
+            report = prober.ProbeReport(channels, results)
+            report.write(constants.PROBE_REPORT_PATH)
+            if self.write_dead_bouquet and prober.write_dead_bouquet(report, settings_dir):
+                servicelist.reload_service.request(servicelist.BOUQUETS).wait(30)
+        except InterruptedError:
+            return
+        except Exception as e:
+            utils.log_error(e, self.__class__.__name__)
+            error_message = f"Błąd podczas sprawdzania strumieni:\n{e}"
+        finally:
+            self._safe_call_main_thread(error_message, report)
+
+
 # --- Pozostałe workery bez zmian ---
 class SourcesXmlDownloadWorker(BaseWorker):
     def __init__(self, callback_finished):
@@ -253,6 +511,7 @@ class SourcesXmlDownloadWorker(BaseWorker):
         self.final_message = None
 
     def run(self):
+        throttle.lower_io_priority()
         target_path = os.path.join(constants.SOURCES_XML_TARGET_DIR, constants.SOURCES_XML_FILENAME)
         filename = constants.SOURCES_XML_FILENAME
         try: